@@ -0,0 +1,398 @@
+"""Offline crawl benchmark: replayed BBC pages and a fake Ollama, no network
+
+Starts a local HTTP server that replays the pages in benchmarks/fixtures/bbc
+(category URLs get the matching category page, every other URL one of the
+article pages) with configurable latency and injected 503s, plus a fake
+Ollama server that streams a valid analysis at a configurable per-token
+latency. Each concurrency setting (and each --parse-workers count) then runs
+crawl_all_content in its own interpreter, so peak RSS is per run.
+
+Reports pages/sec, articles/sec, p50/p95 latency per crawler stage (from the
+crawler's own CrawlMetrics), Ollama tokens/sec, queue depths and peak RSS, and
+writes everything as JSON (--output). --compare flags settings whose
+throughput or p95 latency regressed against a previous JSON file.
+
+Usage: python benchmarks/bench_crawl.py [--workers 2:1,4:2,8:4] [--output crawl.json]
+           [--parse-workers 0,1,2,4] [--batch-analysis] [--latency-ms 20] [--error-rate 0.02] [--token-ms 5] [--compare old.json]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures", "bbc")
+
+ANALYSIS = {
+    "headline": "Replayed headline",
+    "summary": "Summary produced by the fake Ollama server",
+    "key_topics": ["benchmark", "replay"],
+    "sentiment": "neutral",
+    "urgency": "low"
+}
+
+# What /api/show reports, in the shape the ollama client validates (ShowResponse)
+MODEL_SHOW = {
+    'modelfile': '',
+    'parameters': 'num_ctx                        8192',
+    'template': '{{ .Prompt }}',
+    'details': {'parent_model': '', 'format': 'gguf', 'family': 'llama', 'families': ['llama'],
+                'parameter_size': '3.2B', 'quantization_level': 'Q4_K_M'},
+    'model_info': {'general.architecture': 'llama', 'general.parameter_count': 3212749888,
+                   'llama.context_length': 131072},
+    'capabilities': ['completion'],
+    'modified_at': '2024-01-01T00:00:00Z'
+}
+
+STAGES = ('fetch', 'parse', 'classify', 'analyze', 'save')
+
+CHILD = r"""
+import contextlib, importlib.util, json, os, resource, sys, tempfile, time
+path, config = sys.argv[1], json.loads(sys.argv[2])
+spec = importlib.util.spec_from_file_location("crawler_code", path)
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module  # lets parse workers unpickle extract_page
+spec.loader.exec_module(module)
+
+with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+    with contextlib.redirect_stdout(devnull):
+        with module.ImprovedBBCCrawler(**config['crawler']) as crawler:
+            start = time.perf_counter()
+            data = crawler.crawl_all_content(output_path=os.path.join(tmp, 'out.jsonl'),
+                                             max_per_category=config['max_per_category'])
+            wall = time.perf_counter() - start
+
+print("RESULT " + json.dumps({
+    'wall_seconds': wall,
+    'articles': data['summary']['total_articles'],
+    'failed_urls': len(data['crawl_metadata'].get('failed_urls', {})),
+    'metrics': data['crawl_metadata']['metrics'],
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}))
+"""
+
+
+def quiet_disconnects(server_class):
+    """Ignore clients hanging up mid-response (streamed reads cut off on purpose)"""
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            ThreadingHTTPServer.handle_error(self, request, client_address)
+    server_class.handle_error = handle_error
+    return server_class
+
+
+@quiet_disconnects
+class ReplayServer(ThreadingHTTPServer):
+    """Replays fixture pages with injected latency and 503 errors"""
+
+    daemon_threads = True
+
+    def __init__(self, latency, jitter, error_rate, seed=0):
+        super().__init__(('127.0.0.1', 0), ReplayHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.categories = {}
+        self.articles = []
+        for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+            with open(path, 'rb') as f:
+                body = f.read()
+            name = os.path.basename(path)[:-5]
+            if name.endswith('_category'):
+                self.categories[name[:-len('_category')]] = body
+            elif 'article' in name or 'live' in name:
+                self.articles.append(body)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {'pages': 0, 'bytes': 0, 'errors': 0}
+
+    def page_for(self, path):
+        segments = [s for s in path.split('?')[0].split('/') if s]
+        if len(segments) <= 2 and segments and segments[-1] in ('news', 'sport', 'culture', 'travel',
+                                                                 'world', 'uk', 'business', 'politics',
+                                                                 'health', 'education', 'technology',
+                                                                 'football'):
+            return self.categories.get(segments[0], self.categories['culture'])
+        digest = hashlib.md5(path.encode()).digest()
+        return self.articles[digest[0] % len(self.articles)]
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            delay = server.latency + server.random.uniform(0, server.jitter)
+            failed = server.random.random() < server.error_rate
+        time.sleep(delay)
+
+        if failed:
+            with server.lock:
+                server.counts['errors'] += 1
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = server.page_for(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Streamed extraction hangs up once it has enough
+        with server.lock:
+            server.counts['pages'] += 1
+            server.counts['bytes'] += len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@quiet_disconnects
+class FakeOllama(ThreadingHTTPServer):
+    """Streams a valid analysis (or a batch of them) one ~4-char token at a time"""
+
+    daemon_threads = True
+
+    def __init__(self, token_latency):
+        super().__init__(('127.0.0.1', 0), FakeOllamaHandler)
+        self.token_latency = token_latency
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send_json({'models': []})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        if self.path == '/api/show':
+            self._send_json(MODEL_SHOW)
+            return
+        if self.path == '/api/generate':
+            self._send_json({'model': request.get('model'), 'created_at': '2024-01-01T00:00:00Z',
+                             'response': '', 'done': True})
+            return
+
+        schema = request.get('format')
+        if isinstance(schema, dict) and schema.get('type') == 'array':
+            answer = json.dumps([ANALYSIS] * schema.get('minItems', 1))
+        else:
+            answer = json.dumps(ANALYSIS)
+        tokens = [answer[i:i + 4] for i in range(0, len(answer), 4)]
+
+        def message(content, done):
+            return {'model': request.get('model'), 'created_at': '2024-01-01T00:00:00Z',
+                    'message': {'role': 'assistant', 'content': content}, 'done': done}
+
+        if not request.get('stream', True):
+            time.sleep(self.server.token_latency * len(tokens))
+            self._send_json(message(answer, True))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for token in tokens + [None]:
+                time.sleep(self.server.token_latency)
+                line = (json.dumps(message(token or '', token is None)) + '\n').encode()
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The crawler stops reading once the JSON closes
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_config(crawler_path, replay, replay_url, ollama_url, extract, analyze, parse_workers, args):
+    config = {
+        'crawler': {
+            'fetch_origin': replay_url,
+            'ollama_hosts': {ollama_url: analyze},
+            'pipeline_workers': {'discover': 4, 'extract': extract, 'analyze': analyze},
+            'http_cache_dir': None,
+            'index_path': None,
+            'analysis_cache_path': None,
+            'near_duplicate_distance': None,
+            'rate_limit': 1000.0,
+            'rate_burst': 1000,
+            'max_host_concurrency': max(16, extract * 2),
+            'parse_workers': parse_workers,
+            'batch_analysis': args.batch_analysis
+        },
+        'max_per_category': args.max_per_category
+    }
+
+    replay.reset()
+    child = subprocess.run(
+        [sys.executable, "-c", CHILD, crawler_path, json.dumps(config)],
+        capture_output=True, text=True, timeout=args.timeout
+    )
+    lines = [line for line in child.stdout.splitlines() if line.startswith("RESULT ")]
+    if not lines:
+        raise RuntimeError(f"benchmark run failed:\n{child.stderr[-2000:]}")
+    result = json.loads(lines[-1][7:])
+
+    wall = result['wall_seconds']
+    metrics = result['metrics']
+    histograms = metrics['histograms'].get('stage_seconds', {})
+    stages = {}
+    for stage in STAGES:
+        numbers = histograms.get(f"stage={stage}")
+        stages[stage] = {
+            'count': numbers['count'] if numbers else 0,
+            'p50_ms': round(numbers['p50'] * 1000, 2) if numbers else None,
+            'p95_ms': round(numbers['p95'] * 1000, 2) if numbers else None
+        }
+    queues = {label.split('=', 1)[1]: gauge['max'] for label, gauge in metrics['gauges'].get('queue_depth', {}).items()}
+    label = f"extract={extract} analyze={analyze}"
+    if parse_workers:
+        label += f" parse={parse_workers}"
+    if args.batch_analysis:
+        label += " batch"
+    return {
+        'label': label,
+        'extract_workers': extract,
+        'analyze_workers': analyze,
+        'parse_workers': parse_workers,
+        'wall_seconds': round(wall, 3),
+        'pages': replay.counts['pages'],
+        'injected_errors': replay.counts['errors'],
+        'pages_per_sec': round(replay.counts['pages'] / wall, 2),
+        'articles': result['articles'],
+        'articles_per_sec': round(result['articles'] / wall, 2),
+        'failed_urls': result['failed_urls'],
+        'peak_rss_mb': round(result['peak_rss_mb'], 1),
+        'bytes_downloaded': metrics['derived'].get('bytes_downloaded', 0),
+        'ollama_tokens_per_sec': metrics['derived'].get('ollama_tokens_per_sec'),
+        'max_queue_depth': queues,
+        'errors': metrics['counters'].get('errors_total', {}),
+        'stages': stages
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """Print regressions against a previous run; returns True if any were found"""
+    with open(baseline_path) as f:
+        baseline = {run['label']: run for run in json.load(f)['runs']}
+
+    regressed = False
+    for run in results:
+        old = baseline.get(run['label'])
+        if not old:
+            continue
+        checks = [('articles_per_sec', run['articles_per_sec'], old['articles_per_sec'], True)]
+        for stage, numbers in run['stages'].items():
+            before = old['stages'].get(stage, {}).get('p95_ms')
+            if numbers['p95_ms'] is not None and before:
+                checks.append((f"{stage} p95", numbers['p95_ms'], before, False))
+
+        for name, new, before, higher_is_better in checks:
+            change = (new - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressed = True
+                print(f" REGRESSION {run['label']}: {name} {before} -> {new} ({change:+.0%})")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="2:1,4:2,8:4",
+                        help="comma-separated extract:analyze worker counts to compare")
+    parser.add_argument("--parse-workers", default="0",
+                        help="comma-separated parse worker process counts to compare (0 parses in the extract threads)")
+    parser.add_argument("--batch-analysis", action="store_true",
+                        help="analyze several articles per Ollama request (sized from /api/show)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="base page latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="extra random page latency")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="share of page requests answered with 503")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="fake Ollama latency per token")
+    parser.add_argument("--max-per-category", type=int, default=20)
+    parser.add_argument("--crawler", default=os.path.join(HERE, "..", "crawler code.py"))
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="previous --output file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before --compare fails")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    replay = ReplayServer(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate)
+    replay_url = serve(replay)
+    ollama_url = serve(FakeOllama(args.token_ms / 1000))
+
+    settings = [tuple(int(n) for n in setting.split(':')) for setting in args.workers.split(',')]
+    parse_counts = [int(n) for n in args.parse_workers.split(',')]
+    results = []
+    for (extract, analyze), parse_workers in ((s, p) for s in settings for p in parse_counts):
+        run = run_config(os.path.abspath(args.crawler), replay, replay_url, ollama_url,
+                         extract, analyze, parse_workers, args)
+        results.append(run)
+
+        print(f" {run['label']:<22} {run['pages_per_sec']:7.1f} pages/s {run['articles_per_sec']:7.1f} articles/s"
+              f"  {run['wall_seconds']:6.2f}s  peak RSS {run['peak_rss_mb']:.0f} MB"
+              f"  {run['ollama_tokens_per_sec'] or 0:.0f} tokens/s  queues {run['max_queue_depth']}")
+        for stage, numbers in run['stages'].items():
+            if numbers['count']:
+                print(f"   {stage:<16} n={numbers['count']:<4} p50 {numbers['p50_ms']:8.1f} ms  p95 {numbers['p95_ms']:8.1f} ms")
+
+    report = {
+        'benchmark': 'crawl',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'settings': {
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'error_rate': args.error_rate,
+            'token_ms': args.token_ms,
+            'max_per_category': args.max_per_category,
+            'parse_workers': parse_counts,
+            'batch_analysis': args.batch_analysis
+        },
+        'runs': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f" Wrote {args.output}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Extraction benchmark: BeautifulSoup select() scans vs the single-pass extractor
+
+Runs over the saved pages in benchmarks/fixtures/bbc and prints pages/sec for
+the old per-selector BeautifulSoup extraction and for SinglePassExtractor with
+each available backend, then for the streamed mode that stops parsing once
+the title and content budget are found. Also checks that both produce the same
+title, content and links for every page, and that feeding a page in chunks
+of any --chunk-sizes gives the same result as feeding it whole (exits 1 if
+not). Finally parses the pages on process
+pools of each --parse-workers size, as the crawler does with parse_workers.
+
+Usage: python benchmarks/bench_extraction.py [--rounds 20] [--parse-workers 1,2,4,8] [--chunk-sizes 1,7,997,4096]
+"""
+import argparse
+import glob
+import importlib.util
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures", "bbc")
+
+
+def load_crawler_module():
+    path = os.path.join(HERE, "..", "crawler code.py")
+    spec = importlib.util.spec_from_file_location("crawler_code", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # lets pool workers unpickle extract_page
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_extract(html, crawler):
+    """The pre-single-pass extraction: one soup.select() scan per selector"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    title = ""
+    for selector in crawler.TITLE_SELECTORS:
+        title_elem = soup.select_one(selector)
+        if title_elem:
+            title = title_elem.get_text(strip=True)
+            break
+    
+    content_parts = []
+    for selector in crawler.CONTENT_SELECTORS:
+        for elem in soup.select(selector):
+            text = elem.get_text(strip=True)
+            if len(text) > 20 and text not in content_parts:
+                content_parts.append(text)
+        if len(content_parts) >= 5:
+            break
+    
+    links = set()
+    for selector in crawler.LINK_SELECTORS:
+        for link in soup.select(selector):
+            href = link.get('href')
+            if href:
+                links.add(href)
+    
+    return title, content_parts, links
+
+
+def single_pass_extract(html, crawler, backend):
+    extractor = crawler.SinglePassExtractor(backend)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.title, extractor.content_parts(), set(extractor.links)
+
+
+def streamed_extract(html, crawler, backend, budget=3000):
+    extractor = crawler.SinglePassExtractor(backend, content_budget=budget)
+    crawler.stream_into(extractor, crawler.iter_chunks(html))
+    return extractor
+
+
+def chunked_extract(html, crawler, backend, chunk_size):
+    extractor = crawler.SinglePassExtractor(backend)
+    for chunk in crawler.iter_chunks(html, chunk_size):
+        extractor.feed(chunk)
+    extractor.close()
+    return extractor.title, extractor.content_parts(), extractor.links
+
+
+def check_chunk_sizes(crawler, backends, pages, chunk_sizes):
+    """Pages fed in chunks must extract exactly as when fed whole; returns the mismatch count"""
+    mismatches = 0
+    for name, html in pages.items():
+        for backend in backends:
+            whole = chunked_extract(html, crawler, backend, len(html))
+            for chunk_size in chunk_sizes:
+                if chunked_extract(html, crawler, backend, chunk_size) != whole:
+                    print(f" CHUNK MISMATCH: {name} ({backend}, {chunk_size} byte chunks)")
+                    mismatches += 1
+    return mismatches
+
+
+def bench(name, fn, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages.values():
+            fn(html)
+    elapsed = time.perf_counter() - start
+    pages_per_sec = len(pages) * rounds / elapsed
+    print(f" {name:<28} {pages_per_sec:8.1f} pages/sec")
+    return pages_per_sec
+
+
+def bench_pool(crawler, backend, workers, pages, rounds):
+    """pages/sec with every page parsed by extract_page on a pool of worker processes"""
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pool.submit(int).result()  # start the workers outside the timing
+        start = time.perf_counter()
+        futures = [pool.submit(crawler.extract_page, html, backend) for _ in range(rounds) for html in pages.values()]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+    pages_per_sec = len(pages) * rounds / elapsed
+    print(f" {f'pool of {workers} {backend}':<28} {pages_per_sec:8.1f} pages/sec")
+    return pages_per_sec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--parse-workers", default="1,2,4,8",
+                        help="comma-separated process pool sizes to compare")
+    parser.add_argument("--chunk-sizes", default="1,7,997,4096,16384",
+                        help="comma-separated chunk sizes that must extract like the whole page")
+    args = parser.parse_args()
+    
+    crawler = load_crawler_module()
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+        with open(path, 'rb') as f:
+            pages[os.path.basename(path)] = f.read()
+    print(f" {len(pages)} fixture pages, {sum(map(len, pages.values())) / 1024:.0f} KB total, {args.rounds} rounds")
+    
+    backends = ["html.parser"] + (["lxml"] if crawler.lxml_etree is not None else [])
+    
+    chunk_sizes = [int(n) for n in args.chunk_sizes.split(',')]
+    if check_chunk_sizes(crawler, backends, pages, chunk_sizes):
+        print(" FAIL: extraction depends on how the page is chunked")
+        sys.exit(1)
+    print(f" OK: same extraction for chunk sizes {args.chunk_sizes}")
+    
+    try:
+        import bs4  # noqa: F401
+        have_bs4 = True
+    except ImportError:
+        have_bs4 = False
+        print(" bs4 not installed, skipping the BeautifulSoup baseline")
+    
+    if have_bs4:
+        for name, html in pages.items():
+            expected = legacy_extract(html, crawler)
+            for backend in backends:
+                if single_pass_extract(html, crawler, backend) != expected:
+                    print(f" MISMATCH: {name} ({backend})")
+        
+        baseline = bench("bs4 select() (before)", lambda html: legacy_extract(html, crawler), pages, args.rounds)
+    
+    for backend in backends:
+        rate = bench(f"single-pass {backend}", lambda html: single_pass_extract(html, crawler, backend), pages, args.rounds)
+        if have_bs4:
+            print(f"   speedup vs before: {rate / baseline:.1f}x")
+    
+    article_pages = {name: html for name, html in pages.items() if "category" not in name}
+    total = sum(map(len, article_pages.values()))
+    print(f" {len(article_pages)} article pages, streamed with a 3000 char budget:")
+    for backend in backends:
+        read = 0
+        for name, html in article_pages.items():
+            extractor = streamed_extract(html, crawler, backend)
+            read += extractor.bytes_read
+            full = single_pass_extract(html, crawler, backend)
+            if ' '.join(extractor.content_parts())[:3000] != ' '.join(full[1])[:3000]:
+                print(f" STREAM MISMATCH: {name} ({backend})")
+        
+        full_rate = bench(f"full parse {backend}", lambda html: single_pass_extract(html, crawler, backend), article_pages, args.rounds)
+        rate = bench(f"streamed {backend}", lambda html: streamed_extract(html, crawler, backend), article_pages, args.rounds)
+        print(f"   {rate / full_rate:.1f}x faster, read {read / 1024:.0f} of {total / 1024:.0f} KB")
+    
+    print(f" Process pool parsing ({os.cpu_count()} cores):")
+    for backend in backends:
+        single = None
+        for workers in (int(n) for n in args.parse_workers.split(',')):
+            rate = bench_pool(crawler, backend, workers, pages, args.rounds)
+            single = single or rate
+            print(f"   {rate / single:.1f}x vs 1 worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Memory benchmark: article records held by a crawl, dicts vs Article
+
+Builds --sizes articles the way a crawl does (extracted fields, then an
+analysis decoded from a model reply) once as the old plain dicts, which
+kept the ai_analysis dict plus flattened copies of its fields, and once as
+the crawler's Article records. Reports the tracemalloc bytes the records
+add on top of the extracted text they share with the input, and the JSON
+output size per article for the old layout (every article embedded in its
+category and again in all_articles) against the new one (stored once,
+categories list URLs).
+
+Usage: python benchmarks/bench_memory.py [--sizes 10000,100000] [--content-chars 3000]
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import random
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CATEGORIES = ('news', 'sport', 'culture')
+SENTIMENTS = ('positive', 'negative', 'neutral')
+URGENCIES = ('low', 'medium', 'high')
+TOPICS = ('politics', 'economy', 'health', 'football', 'climate', 'technology', 'travel', 'film')
+
+
+def load_crawler_module():
+    path = os.path.join(HERE, "..", "crawler code.py")
+    spec = importlib.util.spec_from_file_location("crawler_code", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def crawl_items(count, content_chars, seed=1):
+    """(extracted fields, model reply text) pairs; each article gets its own strings"""
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9))) for _ in range(2000)]
+    for i in range(count):
+        content = f"{i} " + ' '.join(rng.choice(words) for _ in range(content_chars // 6))
+        fields = {
+            'url': f"https://www.bbc.com/news/articles/c{i:010d}",
+            'title': f"Headline number {i} about {rng.choice(words)}",
+            'content': content[:content_chars],
+            'extracted_at': f"2024-05-06T12:{i % 60:02d}:{i % 59:02d}.{i % 999999:06d}",
+            'word_count': len(content.split()),
+            'category': CATEGORIES[i % len(CATEGORIES)]
+        }
+        reply = json.dumps({
+            'headline': fields['title'],
+            'summary': f"Summary of article {i}: " + ' '.join(rng.choice(words) for _ in range(25)),
+            'key_topics': rng.sample(TOPICS, 3),
+            'sentiment': rng.choice(SENTIMENTS),
+            'urgency': rng.choice(URGENCIES)
+        })
+        yield fields, reply
+
+
+def dict_article(fields, reply):
+    """The old record: ai_analysis plus flattened copies of its fields"""
+    article = dict(fields)
+    article['content_hash'] = f"{hash(fields['url']) & (2 ** 256 - 1):064x}"
+    article['change'] = 'new'
+    analysis = json.loads(reply)
+    article['ai_analysis'] = analysis
+    article['summary'] = analysis.get('summary', '')
+    article['topics'] = analysis.get('key_topics', [])
+    article['sentiment'] = analysis.get('sentiment', 'neutral')
+    article['urgency'] = analysis.get('urgency', 'medium')
+    return article
+
+
+def record_article(crawler, fields, reply):
+    article = crawler.Article(**fields)
+    article['content_hash'] = f"{hash(fields['url']) & (2 ** 256 - 1):064x}"
+    article['change'] = 'new'
+    article['ai_analysis'] = json.loads(reply)
+    return article
+
+
+def measure(build, items):
+    """tracemalloc bytes held by the records build() makes (the input strings are shared)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    records = [build(fields, reply) for fields, reply in items]
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held, elapsed
+
+
+def output_bytes(crawler, items):
+    """JSON bytes per article: old layout (embedded twice) vs new (once plus URL)"""
+    old_records = [dict_article(fields, reply) for fields, reply in items]
+    old = {
+        'categories': {category: {'articles': [a for a in old_records if a['category'] == category]}
+                       for category in CATEGORIES},
+        'all_articles': old_records
+    }
+    new_records = [record_article(crawler, fields, reply) for fields, reply in items]
+    new = {
+        'categories': {category: {'article_urls': [a['url'] for a in new_records if a['category'] == category]}
+                       for category in CATEGORIES},
+        'all_articles': new_records
+    }
+    old_size = len(json.dumps(old, ensure_ascii=False).encode())
+    new_size = len(json.dumps(new, ensure_ascii=False, default=crawler.json_default).encode())
+    return old_size / len(items), new_size / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--content-chars", type=int, default=3000)
+    args = parser.parse_args()
+
+    crawler = load_crawler_module()
+    for size in (int(n) for n in args.sizes.split(',')):
+        items = list(crawl_items(size, args.content_chars))
+        print(f" {size} articles, {args.content_chars} content chars each")
+        results = {}
+        for name, build in (("dict (before)", dict_article),
+                            ("Article", lambda fields, reply: record_article(crawler, fields, reply))):
+            held, elapsed = measure(build, items)
+            results[name] = held
+            print(f"   {name:<14} {held / 2 ** 20:8.1f} MB  {held / size:7.0f} B/article  built in {elapsed:.2f}s")
+        old_held, new_held = results.values()
+        print(f"   Article saves {(old_held - new_held) / 2 ** 20:.1f} MB ({1 - new_held / old_held:.0%})")
+        del items
+
+    old_size, new_size = output_bytes(crawler, list(crawl_items(1000, args.content_chars)))
+    print(f" JSON output: {old_size:.0f} B/article before, {new_size:.0f} B/article now ({1 - new_size / old_size:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    main()
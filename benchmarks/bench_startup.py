@@ -0,0 +1,172 @@
+"""Startup benchmark: time from process start to the crawler's first request
+
+Each run starts a fresh interpreter that imports "crawler code.py", builds an
+ImprovedBBCCrawler and starts a crawl against a local page server, with
+OLLAMA_HOST pointed at a stub whose inference endpoints take
+--inference-delay seconds (a cold CPU model). Reports the median import,
+constructor and time-to-first-request figures and fails if the latter misses
+STARTUP_TARGET_SECONDS.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--inference-delay 2.0] [--crawler PATH]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CATEGORY_PAGE = os.path.join(HERE, "fixtures", "bbc", "news_category.html")
+
+# Budget from process start until the first HTTP request leaves the crawler
+STARTUP_TARGET_SECONDS = 1.0
+
+CHILD = r"""
+import importlib.util, inspect, json, sys, time
+path, page_url, cache_dir = sys.argv[1:4]
+started = float(sys.argv[4])
+spec = importlib.util.spec_from_file_location("crawler_code", path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.time()
+kwargs = dict(url_patterns={'news': [page_url]}, http_cache_dir=cache_dir + '/http',
+              index_path=cache_dir + '/articles.db', analysis_cache_path=None)
+accepted = inspect.signature(module.ImprovedBBCCrawler.__init__).parameters
+crawler = module.ImprovedBBCCrawler(**{k: v for k, v in kwargs.items() if k in accepted})
+constructed = time.time()
+print("STARTUP " + json.dumps({'import': imported - started, 'init': constructed - started}), flush=True)
+crawler.crawl_all_content()
+"""
+
+
+class PageServer(ThreadingHTTPServer):
+    """Serves the fixture category page and remembers when the first request arrived"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), PageHandler)
+        with open(CATEGORY_PAGE, 'rb') as f:
+            self.page = f.read()
+        self.first_request = None
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.server.first_request is None:
+            self.server.first_request = time.time()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(self.server.page)))
+        self.end_headers()
+        self.wfile.write(self.server.page)
+
+    def log_message(self, *args):
+        pass
+
+
+class OllamaStub(ThreadingHTTPServer):
+    """Answers /api/tags and /api/show at once and inference calls after a delay"""
+
+    daemon_threads = True
+
+    def __init__(self, inference_delay):
+        super().__init__(('127.0.0.1', 0), OllamaHandler)
+        self.inference_delay = inference_delay
+
+
+class OllamaHandler(BaseHTTPRequestHandler):
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply({'models': []})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.path == '/api/show':
+            self._reply({'modelfile': '', 'parameters': '', 'template': '', 'details': {}})
+            return
+        time.sleep(self.server.inference_delay)
+        self._reply({
+            'model': 'stub', 'created_at': '2024-01-01T00:00:00Z', 'done': True,
+            'response': '', 'message': {'role': 'assistant', 'content': '{}'}
+        })
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_once(crawler_path, ollama_url, timeout):
+    pages = PageServer()
+    page_url = serve(pages) + "/news"
+    env = dict(os.environ, OLLAMA_HOST=ollama_url)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        started = time.time()
+        child = subprocess.Popen(
+            [sys.executable, "-c", CHILD, crawler_path, page_url, cache_dir, repr(started)],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env
+        )
+        result = {}
+        try:
+            for line in child.stdout:
+                if line.startswith("STARTUP "):
+                    result.update(json.loads(line[8:]))
+                if pages.first_request is not None or time.time() - started > timeout:
+                    break
+            while pages.first_request is None and child.poll() is None and time.time() - started < timeout:
+                time.sleep(0.005)
+        finally:
+            child.kill()
+            child.wait()
+            pages.shutdown()
+
+    if pages.first_request is not None:
+        result['first_request'] = pages.first_request - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--inference-delay", type=float, default=2.0)
+    parser.add_argument("--crawler", default=os.path.join(HERE, "..", "crawler code.py"))
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    ollama_url = serve(OllamaStub(args.inference_delay))
+    runs = [run_once(os.path.abspath(args.crawler), ollama_url, args.timeout) for _ in range(args.runs)]
+
+    print(f" {args.runs} runs, stub inference delay {args.inference_delay:.1f}s")
+    for key, label in (('import', 'module import'), ('init', 'constructor done'), ('first_request', 'first request')):
+        values = [run[key] for run in runs if key in run]
+        if values:
+            print(f" {label:<20} median {statistics.median(values):6.3f}s  max {max(values):6.3f}s")
+        else:
+            print(f" {label:<20} not reached")
+
+    first = [run['first_request'] for run in runs if 'first_request' in run]
+    if len(first) < len(runs) or statistics.median(first) > STARTUP_TARGET_SECONDS:
+        print(f" FAIL: first request later than the {STARTUP_TARGET_SECONDS:.1f}s target")
+        sys.exit(1)
+    print(f" OK: first request within the {STARTUP_TARGET_SECONDS:.1f}s target")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""URL classification microbenchmark: substring checks vs the compiled URLClassifier
+
+Generates synthetic BBC-style links (articles, section pages, live pages,
+assets, tracking-parameter variants, bbc.co.uk aliases) and times the old
+is_valid_article_url + categorize_url pair against URLClassifier.classify.
+Also reports how many distinct articles remain after canonical dedup, and
+exits 1 if classify() disagrees with CLASSIFY_CASES or with the legacy
+category of any URL both accept.
+
+Usage: python benchmarks/bench_urls.py [--count 1000000] [--repeat 3]
+"""
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_crawler_module():
+    path = os.path.join(HERE, "..", "crawler code.py")
+    spec = importlib.util.spec_from_file_location("crawler_code", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# (url, expected URLClassifier.classify() result)
+CLASSIFY_CASES = [
+    ("https://www.bbc.com/news/world/", ("https://www.bbc.com/news/world", "world")),
+    ("https://www.bbc.com/news/world", ("https://www.bbc.com/news/world", "news")),
+    ("https://www.bbc.co.uk/news/uk/articles/c1?at_medium=RSS#top", ("https://www.bbc.com/news/uk/articles/c1", "uk")),
+    ("http://bbc.com:80/sport/football/articles/c1/", ("https://www.bbc.com/sport/football/articles/c1", "sport")),
+    ("https://www.bbc.com/news/articles/c1?page=2", None),
+    ("https://www.bbc.com/news/live/c1", None),
+    ("https://www.bbc.com/News/articles/c1", None),
+    ("https://www.bbc.com:8080/news/articles/c1", None),
+    ("https://www.example.com/news/c1", None),
+]
+
+
+def legacy_is_valid(url):
+    if not url or not url.startswith('https://www.bbc.com'):
+        return False
+    exclude_patterns = [
+        '/live/', '/topics/', '/programmes/', '/sounds/',
+        '/weather/', '/search/', '/contact/', '/about/',
+        '/accessibility/', '/privacy/', '/cookies/',
+        '/player/', '/iplayer/', '/sounds/', '/contact',
+        '.json', '.xml', '.css', '.js', '.png', '.jpg',
+        '#', '?', 'mailto:', 'tel:'
+    ]
+    for pattern in exclude_patterns:
+        if pattern in url.lower():
+            return False
+    valid_patterns = ['/news/', '/sport/', '/culture/', '/travel/', '/future/', '/worklife/']
+    return any(pattern in url for pattern in valid_patterns)
+
+
+def legacy_categorize(url):
+    if not url:
+        return 'unknown'
+    if '/news/' in url:
+        for sub in ('world', 'uk', 'business', 'politics', 'health', 'technology', 'science'):
+            if f'/{sub}/' in url:
+                return sub
+        return 'news'
+    for section in ('sport', 'culture', 'travel', 'future'):
+        if f'/{section}/' in url:
+            return section
+    return 'general'
+
+
+def synthetic_urls(count, seed=42):
+    rng = random.Random(seed)
+    hosts = ['https://www.bbc.com'] * 6 + ['https://www.bbc.co.uk', 'http://bbc.com']
+    sections = ['news', 'news/world', 'news/uk', 'news/business', 'news/technology',
+                'sport/football', 'sport', 'culture', 'travel', 'future']
+    article_ids = [f"c{rng.getrandbits(40):010x}o" for _ in range(max(1, count // 20))]
+    suffixes = ['', '', '', '/', '#comments', '?at_medium=RSS&at_campaign=rss', '?utm_source=twitter', '?page=2']
+    junk = ['/news/live/{}', '/news/topics/{}', '/sounds/play/{}', '/weather/{}', '/static/{}.js', '/img/{}.png']
+    
+    urls = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.75:
+            urls.append(f"{rng.choice(hosts)}/{rng.choice(sections)}/articles/{rng.choice(article_ids)}{rng.choice(suffixes)}")
+        elif roll < 0.95:
+            urls.append(rng.choice(hosts) + rng.choice(junk).format(rng.choice(article_ids)))
+        else:
+            urls.append(f"https://www.example.com/news/{rng.choice(article_ids)}")
+    return urls
+
+
+def timed(fn, repeat):
+    """Best wall time of repeat runs of fn, and fn's result"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs is reported")
+    args = parser.parse_args()
+    
+    crawler = load_crawler_module()
+    classifier = crawler.URLClassifier()
+    urls = synthetic_urls(args.count)
+    print(f" {len(urls):,} synthetic URLs")
+    
+    failures = [(url, expected) for url, expected in CLASSIFY_CASES if classifier.classify(url) != expected]
+    for url, expected in failures:
+        print(f" CASE MISMATCH: {url} -> {classifier.classify(url)}, expected {expected}")
+    for url in urls + [url for url, _ in CLASSIFY_CASES]:
+        classified = classifier.classify(url)
+        if classified and legacy_is_valid(url) and classified[1] != legacy_categorize(url):
+            print(f" CATEGORY MISMATCH: {url} -> {classified[1]}, legacy {legacy_categorize(url)}")
+            failures.append((url, None))
+    if failures:
+        print(f" FAIL: {len(failures)} classify() mismatches")
+        sys.exit(1)
+    
+    def legacy_pass():
+        legacy = []
+        for url in urls:
+            if legacy_is_valid(url):
+                legacy_categorize(url)
+                legacy.append(url)
+        return legacy
+    
+    def classify_pass():
+        fresh = crawler.URLClassifier()  # Cold directory cache every round
+        canonical = []
+        for url in urls:
+            classified = fresh.classify(url)
+            if classified:
+                canonical.append(classified[0])
+        return canonical
+    
+    def validate_pass():
+        for url in urls:
+            if classifier.is_valid(url):
+                classifier.categorize(url)
+    
+    legacy_time, legacy = timed(legacy_pass, args.repeat)
+    validate_time, _ = timed(validate_pass, args.repeat)
+    compiled_time, canonical = timed(classify_pass, args.repeat)
+    
+    print(f" legacy is_valid + categorize      {len(urls) / legacy_time / 1e6:5.2f} M urls/sec"
+          f"  accepted {len(legacy):,}, distinct {len(set(legacy)):,}")
+    print(f" URLClassifier is_valid+categorize {len(urls) / validate_time / 1e6:5.2f} M urls/sec")
+    print(f" URLClassifier.classify (canonical) {len(urls) / compiled_time / 1e6:4.2f} M urls/sec"
+          f"  accepted {len(canonical):,}, distinct {len(set(canonical)):,}")
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,2851 @@
-import requests
-from bs4 import BeautifulSoup
 import time
 import json
 import re
-from urllib.parse import urljoin, urlparse
-from datetime import datetime
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from email.utils import parsedate_to_datetime
 import random
+import itertools
+import copy
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
-import ollama
+import queue
+import asyncio
+import atexit
+import os
+import sys
+import hashlib
+import heapq
+import sqlite3
+import codecs
+import contextlib
+import importlib.util
+from html.parser import HTMLParser
+from xml.etree import ElementTree
 import warnings
 warnings.filterwarnings("ignore")
 
+# requests, ollama and aiohttp are imported where they are first used: together
+# they account for most of the module's import time, and a crawl should have
+# its first request out before they are all loaded.
+HAVE_AIOHTTP = importlib.util.find_spec('aiohttp') is not None
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+
+# Analysis prompts. PROMPT_VERSION is derived from the templates so any edit
+# to them invalidates cached analyses automatically.
+ANALYSIS_PROMPT = """Analyze this {category} article briefly. Return only JSON:
+
+Content: {content}...
+
+{{"headline":"Main headline","summary":"Brief summary","key_topics":["topic1","topic2"],"sentiment":"positive/negative/neutral","urgency":"high/medium/low"}}"""
+
+BATCH_ANALYSIS_PROMPT = """Analyze each of these {count} articles briefly. Return only a JSON array with exactly {count} objects, one per article, in the same order:
+
+{articles}
+
+[{{"headline":"Main headline","summary":"Brief summary","key_topics":["topic1","topic2"],"sentiment":"positive/negative/neutral","urgency":"high/medium/low"}}, ...]"""
+
+PROMPT_VERSION = hashlib.sha256((ANALYSIS_PROMPT + BATCH_ANALYSIS_PROMPT).encode('utf-8')).hexdigest()[:12]
+
+# Structured-output schema passed as Ollama's `format`, so the model emits
+# exactly one analysis object with no surrounding chatter
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "headline": {"type": "string"},
+        "summary": {"type": "string"},
+        "key_topics": {"type": "array", "items": {"type": "string"}},
+        "sentiment": {"type": "string", "enum": ["positive", "negative", "neutral"]},
+        "urgency": {"type": "string", "enum": ["high", "medium", "low"]}
+    },
+    "required": ["headline", "summary", "key_topics", "sentiment", "urgency"]
+}
+
+
+def batch_analysis_schema(count):
+    """Schema for a batched response: an array of exactly count analyses"""
+    return {"type": "array", "items": ANALYSIS_SCHEMA, "minItems": count, "maxItems": count}
+
+
+class JSONStreamScanner:
+    """Finds where the first valid top-level JSON value closes in streamed text
+
+    Tracks nesting depth and string/escape state one character at a time, so
+    each streamed token is scanned once and the caller can stop generation the
+    moment the value is complete. Only `opening` brackets start a value (just
+    '{' when an object is expected), and a balanced span that does not parse,
+    like the "[JSON]" in "Sure [JSON]: {...}", is skipped and scanning goes on
+    right after its opening bracket.
+    """
+
+    def __init__(self, opening='{['):
+        self.opening = opening
+        self.buffer = ''
+        self.pos = 0
+        self.start = None
+        self.end = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.rejected = 0
+
+    def feed(self, chunk):
+        """Consume more text; returns True once a valid top-level value has closed"""
+        if self.end is not None:
+            return True
+        self.buffer += chunk
+        text = self.buffer
+        i = self.pos
+        
+        while i < len(text):
+            ch = text[i]
+            i += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif self.start is None:
+                if ch in self.opening:
+                    self.start = i - 1
+                    self.depth = 1
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        json.loads(text[self.start:i])
+                    except ValueError:
+                        self.rejected += 1
+                        i = self.start + 1
+                        self.start = None
+                        continue
+                    self.end = i
+                    break
+        
+        self.pos = i
+        return self.end is not None
+
+    @property
+    def text(self):
+        return self.buffer
+
+    @property
+    def value(self):
+        """Text of the completed JSON value, or None if it never closed"""
+        if self.end is None:
+            return None
+        return self.text[self.start:self.end]
+
+
+# Returned when Ollama analysis fails; never treated as a reusable result
+FALLBACK_ANALYSIS = {
+    "headline": "Analysis failed",
+    "summary": "Could not analyze content",
+    "key_topics": [],
+    "sentiment": "neutral",
+    "urgency": "medium"
+}
+
+
+# URL rules for BBC article links
+EXCLUDE_URL_PATTERNS = [
+    '/live/', '/topics/', '/programmes/', '/sounds/',
+    '/weather/', '/search/', '/contact/', '/about/',
+    '/accessibility/', '/privacy/', '/cookies/',
+    '/player/', '/iplayer/', '/contact',
+    '.json', '.xml', '.css', '.js', '.png', '.jpg',
+    '#', '?', 'mailto:', 'tel:'
+]
+
+ARTICLE_SECTIONS = ['/news/', '/sport/', '/culture/', '/travel/', '/future/', '/worklife/']
+
+# (section marker, category, [(sub-section marker, category), ...]) - first hit wins
+URL_CATEGORY_RULES = [
+    ('/news/', 'news', [
+        ('/world/', 'world'),
+        ('/uk/', 'uk'),
+        ('/business/', 'business'),
+        ('/politics/', 'politics'),
+        ('/health/', 'health'),
+        ('/technology/', 'technology'),
+        ('/science/', 'science')
+    ]),
+    ('/sport/', 'sport', []),
+    ('/culture/', 'culture', []),
+    ('/travel/', 'travel', []),
+    ('/future/', 'future', [])
+]
+
+# Hosts that serve the same BBC articles as www.bbc.com
+BBC_HOST_ALIASES = {
+    'bbc.com': 'www.bbc.com',
+    'bbc.co.uk': 'www.bbc.com',
+    'www.bbc.co.uk': 'www.bbc.com',
+    'm.bbc.co.uk': 'www.bbc.com',
+    'm.bbc.com': 'www.bbc.com'
+}
+
+_TRACKING_PARAM_RE = re.compile(r'^(?:utm_\w*|at_\w*|ns_\w*|xtor|ocid|fbclid|gclid|cmpid)$', re.IGNORECASE)
+
+
+_URL_RE = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*)://([^/?#:@]*)(?::(\d*))?([^?#]*)(?:\?([^#]*))?')
+
+
+# Canonical "scheme://host[:port]" per origin as written in a link (None if it
+# is not a valid one); a crawl sees only a handful, so each is worked out once
+_ORIGINS = {}
+_ORIGINS_LIMIT = 10000
+
+
+def _canonical_origin(head):
+    origin = _ORIGINS.get(head, False)
+    if origin is False:
+        match = _URL_RE.match(head)
+        origin = None
+        if match and match.end() == len(head) and not match.group(4) and match.group(5) is None:
+            scheme, host, port = match.group(1).lower(), match.group(2).lower(), match.group(3)
+            if port and (scheme, port) not in (('http', '80'), ('https', '443')):
+                host = f"{host}:{port}"
+            host = BBC_HOST_ALIASES.get(host, host)
+            if host == 'www.bbc.com':
+                scheme = 'https'
+            origin = f"{scheme}://{host}"
+        if len(_ORIGINS) >= _ORIGINS_LIMIT:
+            _ORIGINS.clear()
+        _ORIGINS[head] = origin
+    return origin
+
+
+def _split_url(url):
+    """(canonical origin, path, query) of an absolute URL, or None if _URL_RE would not match it
+    
+    Plain string splitting plus the memoized origin, which is what makes
+    classify() cheaper than running _URL_RE on every link.
+    """
+    scheme_end = url.find('://')
+    slash = url.find('/', scheme_end + 3) if scheme_end > 0 else -1
+    head = url if slash < 0 else url[:slash]
+    if '?' in head or '#' in head:
+        match = _URL_RE.match(url)
+        if not match:
+            return None
+        head = url[:match.end(3) if match.group(3) is not None else match.end(2)]
+        slash = len(head)
+    origin = _canonical_origin(head)
+    if origin is None:
+        return None
+    
+    rest = url[slash:] if slash >= 0 else ''
+    fragment = rest.find('#')
+    if fragment >= 0:
+        rest = rest[:fragment]
+    path, _, query = rest.partition('?')
+    return origin, path, query
+
+
+_QUERIES = {}
+
+
+def _strip_tracking(query):
+    """query without its tracking params (memoized: the same utm_/at_ strings recur)"""
+    stripped = _QUERIES.get(query)
+    if stripped is None:
+        stripped = '&'.join(
+            param for param in query.split('&')
+            if param and not _TRACKING_PARAM_RE.match(param.split('=', 1)[0])
+        )
+        if len(_QUERIES) >= _ORIGINS_LIMIT:
+            _QUERIES.clear()
+        _QUERIES[query] = stripped
+    return stripped
+
+
+def canonicalize_url(url):
+    """Canonical form of a URL: BBC host aliases folded, fragment and tracking params
+    dropped, default port and trailing slash removed"""
+    split = _split_url(url.strip())
+    if not split:
+        parts = urlsplit(url.strip())
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, parts.query, ''))
+    
+    origin, path, query = split
+    path = path.rstrip('/') or '/'
+    if query:
+        query = _strip_tracking(query)
+        if query:
+            return f"{origin}{path}?{query}"
+    return f"{origin}{path}"
+
+
+# Directory paths whose verdict URLClassifier.classify() remembers
+DIRECTORY_CACHE_SIZE = 10000
+
+
+class URLClassifier:
+    """Table-driven validation and categorization of BBC URLs
+    
+    The rule tables are compiled once into sets of path segments, so a URL is
+    split a single time and every rule becomes a set lookup instead of a
+    substring scan over the whole URL.
+    """
+
+    def __init__(self, base_url="https://www.bbc.com"):
+        self.base_url = base_url
+        self.path_start = base_url.count("/") + 1
+        
+        # '/live/'-style patterns match a path segment that is followed by '/';
+        # everything else is a plain substring test on the lowercased URL.
+        self.exclude_segments = frozenset(
+            p.strip('/') for p in EXCLUDE_URL_PATTERNS if p.startswith('/') and p.endswith('/')
+        )
+        self.exclude_prefixes = tuple(
+            p.strip('/') for p in EXCLUDE_URL_PATTERNS if p.startswith('/') and not p.endswith('/')
+        )
+        self.exclude_substrings = tuple(
+            p for p in EXCLUDE_URL_PATTERNS if not p.startswith('/') and not p.startswith('.')
+        )
+        self.exclude_extensions = tuple(p for p in EXCLUDE_URL_PATTERNS if p.startswith('.'))
+        # What _excluded() tests besides whole segments, as substrings of a path
+        # ('#' and '?' cannot occur there); classify() checks the prefix as a
+        # plain startswith before falling back to _split_url()
+        self.exclude_path_substrings = tuple(
+            [p for p in self.exclude_substrings if p not in ('#', '?')]
+            + ['/' + prefix for prefix in self.exclude_prefixes]
+        )
+        self.base_prefix = base_url + '/'
+        self._directories = {}  # directory path -> category, or None if excluded
+        
+        self.sections = frozenset(p.strip('/') for p in ARTICLE_SECTIONS)
+        self.category_rules = tuple(
+            (section.strip('/'), category, tuple((m.strip('/'), sub) for m, sub in sub_rules))
+            for section, category, sub_rules in URL_CATEGORY_RULES
+        )
+
+    def _segments(self, url):
+        """Path segments that are followed by a '/' (what '/x/' in url tests for)"""
+        return url.split('/')[self.path_start:-1]
+
+    def _category(self, segments):
+        for section, category, sub_rules in self.category_rules:
+            if section in segments:
+                for marker, sub_category in sub_rules:
+                    if marker in segments:
+                        return sub_category
+                return category
+        return 'general'
+
+    def _excluded(self, url):
+        lowered = url.lower()
+        for pattern in self.exclude_substrings:
+            if pattern in lowered:
+                return True
+        
+        path = lowered[len(self.base_url):]
+        if '.' in path:
+            for extension in self.exclude_extensions:
+                if extension in path:
+                    return True
+        
+        segments = lowered.split('/')[self.path_start:]
+        if not self.exclude_segments.isdisjoint(segments[:-1]):
+            return True
+        return any(segment.startswith(self.exclude_prefixes) for segment in segments)
+
+    def categorize(self, url):
+        if not url:
+            return 'unknown'
+        return self._category(set(url.split('/')[:-1]))
+
+    def is_valid(self, url):
+        if not url or not url.startswith(self.base_url) or self._excluded(url):
+            return False
+        return not self.sections.isdisjoint(self._segments(url))
+
+    def classify(self, url):
+        """Canonicalize and classify in one go: (canonical_url, category), or None if not an article
+        
+        Works on the path and query directly instead of building the canonical
+        URL and splitting it again. The rules see the path as written, so a
+        trailing slash still counts ('/news/world/' is 'world', as in
+        categorize()); only the returned URL drops it.
+        """
+        url = url.strip()
+        if url.startswith(self.base_prefix):
+            # Already canonical origin, by far the most common case
+            rest = url[len(self.base_url):]
+            fragment = rest.find('#')
+            if fragment >= 0:
+                rest = rest[:fragment]
+            path, _, query = rest.partition('?')
+        else:
+            split = _split_url(url)
+            if not split or split[0] != self.base_url:
+                return None  # Not an absolute BBC URL (or one with userinfo)
+            _, path, query = split
+        if query and _strip_tracking(query):
+            return None  # The canonical URL keeps a '?', which is excluded
+        
+        # Rules on segments only look at the directory part, and a crawl sees few
+        # distinct directories, so those verdicts are memoized; the last segment
+        # only needs the substring tests
+        cut = path.rfind('/') + 1
+        directory = path[:cut]
+        category = self._directories.get(directory, False)
+        if category is False:
+            category = self._classify_directory(directory)
+            if len(self._directories) >= DIRECTORY_CACHE_SIZE:
+                self._directories.clear()
+            self._directories[directory] = category
+        if category is None:
+            return None
+        
+        name = path[cut:].lower()
+        if name:
+            if name.startswith(self.exclude_prefixes) or self._has_excluded_text(name):
+                return None
+        return self.base_url + (path.rstrip('/') or '/'), category
+
+    def _has_excluded_text(self, lowered):
+        for pattern in self.exclude_path_substrings:
+            if pattern in lowered:
+                return True
+        if '.' in lowered:
+            for extension in self.exclude_extensions:
+                if extension in lowered:
+                    return True
+        return False
+
+    def _classify_directory(self, directory):
+        """Category of article URLs directly under directory (a path ending in '/'), or None"""
+        lowered = directory.lower()
+        if self._has_excluded_text(lowered):
+            return None
+        segments = directory.split('/')[1:-1]
+        # Exclusions ignore case, sections and categories do not (as in is_valid())
+        lowered_segments = segments if lowered == directory else lowered.split('/')[1:-1]
+        if not self.exclude_segments.isdisjoint(lowered_segments) or self.sections.isdisjoint(segments):
+            return None
+        return self._category(segments)
+
+
+# Feed/sitemap discovery. Tags are compared without their XML namespace so
+# RSS 2.0, Atom and sitemap (including news: extensions) share one parser.
+# <url> is an entry only directly under a sitemap's <urlset> (RSS has <image><url>)
+FEED_ENTRY_TAGS = {'item', 'entry'}
+SITEMAP_ENTRY = ('urlset', 'url')
+FEED_DATE_TAGS = ('publication_date', 'lastmod', 'pubDate', 'published', 'updated', 'date')
+FEED_CHUNK_SIZE = 64 * 1024
+DISCOVERY_SOURCES = ('html', 'rss', 'sitemap')
+
+
+def _local_tag(tag):
+    """Strip the {namespace} prefix from an ElementTree tag"""
+    return tag.rpartition('}')[2] if isinstance(tag, str) else ''
+
+
+def parse_feed_date(value):
+    """Parse an RFC 822 (RSS) or W3C/ISO 8601 (Atom, sitemap) date as UTC"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        if value[:1].isdigit():
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        else:
+            parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _feed_entry(elem):
+    """Return (link, published) for one <item>, <entry> or sitemap <url>"""
+    link = None
+    dates = {}
+    for child in elem.iter():
+        if child is elem:
+            continue
+        tag = _local_tag(child.tag)
+        if tag == 'link' and link is None:
+            # Atom carries the URL in href, RSS in the element text
+            rel = child.get('rel', 'alternate')
+            href = child.get('href')
+            if href and rel == 'alternate':
+                link = href.strip()
+            elif child.text and child.text.strip():
+                link = child.text.strip()
+        elif tag == 'loc' and link is None and child.text:
+            link = child.text.strip()
+        elif tag in FEED_DATE_TAGS and child.text and tag not in dates:
+            dates[tag] = child.text
+    
+    if link is None:
+        # Some RSS feeds only carry a permalink guid
+        for child in elem:
+            if _local_tag(child.tag) == 'guid' and child.text:
+                if child.get('isPermaLink', 'true') != 'false':
+                    link = child.text.strip()
+                break
+    
+    published = None
+    for tag in FEED_DATE_TAGS:
+        if tag in dates:
+            published = parse_feed_date(dates[tag])
+            if published:
+                break
+    return link, published
+
+
+def iter_feed_entries(body, chunk_size=FEED_CHUNK_SIZE):
+    """Stream (link, published) pairs out of an RSS, Atom or sitemap document
+    
+    The body is fed to an incremental pull parser in chunks and each entry is
+    cleared and removed from its parent once read, so memory stays flat and
+    callers can stop early.
+    """
+    if isinstance(body, str):
+        # The text is already decoded; drop the declaration so expat does not
+        # try to re-apply its encoding
+        body = re.sub(r'^\s*<\?xml[^>]*\?>', '', body, count=1)
+    
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    open_elements = []
+
+    def read_entries():
+        for event, elem in parser.read_events():
+            if event == 'start':
+                open_elements.append(elem)
+                continue
+            open_elements.pop()
+            parent = open_elements[-1] if open_elements else None
+            tag = _local_tag(elem.tag)
+            if tag in FEED_ENTRY_TAGS or (parent is not None and (_local_tag(parent.tag), tag) == SITEMAP_ENTRY):
+                yield _feed_entry(elem)
+                elem.clear()
+                if parent is not None:
+                    parent.remove(elem)
+    
+    for start in range(0, len(body), chunk_size):
+        parser.feed(body[start:start + chunk_size])
+        yield from read_entries()
+    parser.close()
+    yield from read_entries()
+
+
+class HTTPCache:
+    """On-disk HTTP cache for conditional GETs (ETag / Last-Modified) with LRU eviction
+
+    A streamed download that stopped at the extractor's content budget is
+    cached as the prefix that was read (complete=0). That prefix is all a
+    fresh extractor needs to reach the same result again, so a 304 for it can
+    be replayed into an extractor, but never returned as a whole page.
+    """
+
+    def __init__(self, cache_dir=".crawler_cache/http", max_bytes=200 * 1024 * 1024, max_age=7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER,
+                stored_at REAL,
+                last_access REAL,
+                complete INTEGER NOT NULL DEFAULT 1
+            )
+        """)
+        try:
+            # Caches written before partial entries existed
+            self.db.execute("ALTER TABLE entries ADD COLUMN complete INTEGER NOT NULL DEFAULT 1")
+        except sqlite3.OperationalError:
+            pass
+        self.db.commit()
+        self.evict()
+
+    def _body_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".body")
+
+    def conditional_headers(self, url, partial_ok=False):
+        """Validators to send with the next request for this URL
+        
+        Entries holding only a cut-short prefix count only with partial_ok,
+        i.e. when the response will be streamed into an extractor.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT etag, last_modified, complete FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if not row or not (row[2] or partial_ok):
+            return {}
+        
+        headers = {}
+        if row[0]:
+            headers['If-None-Match'] = row[0]
+        if row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def load(self, url):
+        """Return the cached body for a 304 response, or None if it is gone"""
+        try:
+            with open(self._body_path(url), 'rb') as f:
+                body = f.read()
+        except OSError:
+            self.misses += 1
+            self.remove(url)
+            return None
+        
+        with self.lock:
+            self.db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.db.commit()
+        self.hits += 1
+        return body
+
+    def replay(self, url, sink_factory=None):
+        """Cached response for a 304: the body, or a fresh sink fed from it
+        
+        None means the entry cannot stand in for the page (body gone, or a
+        prefix that no longer satisfies the extractor) and it must be fetched
+        again without validators.
+        """
+        body = self.load(url)
+        if body is None or not sink_factory:
+            return body
+        with self.lock:
+            row = self.db.execute("SELECT complete FROM entries WHERE url = ?", (url,)).fetchone()
+        complete = not row or row[0]
+        sink = sink_factory()
+        # A prefix goes in as one piece: the extractor then sees exactly the
+        # bytes it stopped at originally and ends in the same state
+        stream_into(sink, iter_chunks(body) if complete else [body])
+        if not complete and not sink.truncated:
+            # The prefix ran out before the extractor was satisfied (e.g. a
+            # bigger content budget than when it was cached)
+            self.remove(url)
+            return None
+        return sink
+
+    def store(self, url, body, headers, complete=True):
+        """Cache a 200 response body if the server sent validators for it
+        
+        complete=False marks a body cut short at the extractor's budget.
+        """
+        self.misses += 1
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        
+        tmp_path = self._body_path(url) + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, self._body_path(url))
+        
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, len(body), now, now, int(complete))
+            )
+            self.db.commit()
+        self.evict()
+
+    def remove(self, url):
+        with self.lock:
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self.db.commit()
+        try:
+            os.remove(self._body_path(url))
+        except OSError:
+            pass
+
+    def evict(self):
+        """Drop entries older than max_age, then least recently used ones until under max_bytes"""
+        with self.lock:
+            expired = [row[0] for row in self.db.execute(
+                "SELECT url FROM entries WHERE stored_at < ?", (time.time() - self.max_age,)
+            )]
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            lru = []
+            if total > self.max_bytes:
+                for url, size in self.db.execute("SELECT url, size FROM entries ORDER BY last_access"):
+                    if total <= self.max_bytes:
+                        break
+                    if url not in expired:
+                        lru.append(url)
+                        total -= size
+        
+        for url in expired + lru:
+            self.remove(url)
+
+
+def intern_value(value):
+    """sys.intern() for strings, anything else unchanged"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Article(MutableMapping):
+    """One crawled article, held once for the whole crawl
+
+    A __slots__ record instead of a dict. The analysis lives in its own fields
+    rather than in an ai_analysis dict plus flattened copies of it, and the
+    category, sentiment, urgency, change and topic strings are interned so all
+    articles share one object per value. Item access (article['url'], get(),
+    dict(article)) works as it did for dicts; article['ai_analysis'] is
+    rebuilt on demand. Unset fields (None) are absent keys.
+    """
+
+    __slots__ = ('url', 'title', 'content', 'extracted_at', 'word_count', 'category',
+                 'content_hash', 'change', 'duplicate_of',
+                 'headline', 'summary', 'topics', 'sentiment', 'urgency')
+    INTERNED = frozenset(['category', 'sentiment', 'urgency', 'change'])
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        for name, value in fields.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        """Article from a plain dict (JSON output or an older index record)"""
+        article = cls()
+        for name, value in data.items():
+            if name in cls.__slots__:
+                article[name] = value
+        if data.get('ai_analysis'):
+            article.set_analysis(data['ai_analysis'])
+        return article
+
+    @property
+    def analyzed(self):
+        return self.summary is not None
+
+    def set_analysis(self, analysis):
+        self.headline = analysis.get('headline', '')
+        self.summary = analysis.get('summary', '')
+        self['topics'] = analysis.get('key_topics', [])
+        self['sentiment'] = analysis.get('sentiment', 'neutral')
+        self['urgency'] = analysis.get('urgency', 'medium')
+
+    @property
+    def ai_analysis(self):
+        if not self.analyzed:
+            return None
+        return {
+            'headline': self.headline,
+            'summary': self.summary,
+            'key_topics': list(self.topics),
+            'sentiment': self.sentiment,
+            'urgency': self.urgency
+        }
+
+    def __getitem__(self, name):
+        if name == 'ai_analysis':
+            value = self.ai_analysis
+        elif name in self.__slots__:
+            value = getattr(self, name)
+        else:
+            value = None
+        if value is None:
+            raise KeyError(name)
+        return list(value) if name == 'topics' else value
+
+    def __setitem__(self, name, value):
+        if name == 'ai_analysis':
+            self.set_analysis(value)
+        elif name == 'topics':
+            self.topics = tuple(intern_value(topic) for topic in value) if isinstance(value, (list, tuple)) else ()
+        elif name in self.INTERNED:
+            setattr(self, name, intern_value(value))
+        elif name in self.__slots__:
+            setattr(self, name, value)
+        else:
+            raise KeyError(f"Article has no field {name!r}")
+
+    def __delitem__(self, name):
+        if name not in self.__slots__ or getattr(self, name) is None:
+            raise KeyError(name)
+        setattr(self, name, None)
+
+    def __iter__(self):
+        return (name for name in self.__slots__ if getattr(self, name) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return dict(self)
+
+
+def json_default(value):
+    """json.dump hook that writes Article records as plain objects"""
+    if isinstance(value, Article):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ArticleIndex:
+    """Persistent index of crawled articles keyed by canonical URL and content hash"""
+
+    def __init__(self, db_path=".crawler_cache/articles.db"):
+        self.lock = threading.Lock()
+        
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT,
+                article TEXT,
+                first_seen REAL,
+                last_checked REAL
+            )
+        """)
+        self.db.commit()
+
+    @staticmethod
+    def canonical_url(url):
+        """Normalize a URL so the same article always maps to one index key"""
+        return canonicalize_url(url)
+
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def lookup(self, url):
+        """Return (content_hash, stored article, last_checked) or None for unseen URLs"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT content_hash, article, last_checked FROM articles WHERE url = ?",
+                (self.canonical_url(url),)
+            ).fetchone()
+        if not row:
+            return None
+        return row[0], Article.from_dict(json.loads(row[1])), row[2]
+
+    def record(self, article):
+        """Store an analyzed article (insert or update)"""
+        key = self.canonical_url(article['url'])
+        stored = {k: v for k, v in article.items() if k != 'change'}
+        now = time.time()
+        with self.lock:
+            self.db.execute("""
+                INSERT INTO articles (url, content_hash, article, first_seen, last_checked)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    article = excluded.article,
+                    last_checked = excluded.last_checked
+            """, (key, article['content_hash'], json.dumps(stored, ensure_ascii=False), now, now))
+            self.db.commit()
+
+    def touch(self, url):
+        with self.lock:
+            self.db.execute(
+                "UPDATE articles SET last_checked = ? WHERE url = ?",
+                (time.time(), self.canonical_url(url))
+            )
+            self.db.commit()
+
+
+class AnalysisCache:
+    """Content-addressed memo of Ollama analyses: in-memory LRU in front of SQLite, with TTL"""
+
+    def __init__(self, db_path=".crawler_cache/analysis.db", max_entries=1024, ttl=72 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                analysis TEXT,
+                stored_at REAL
+            )
+        """)
+        self.db.execute("DELETE FROM analyses WHERE stored_at < ?", (time.time() - ttl,))
+        self.db.commit()
+
+    @staticmethod
+    def key(model_name, category, content):
+        """Cache key - changes with the model, the prompt templates or the analyzed text"""
+        material = "\0".join([PROMPT_VERSION, model_name, category, content[:800]])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return a fresh copy of the cached analysis, or None"""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and entry[1] >= now - self.ttl:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[0])
+            
+            row = self.db.execute("SELECT analysis, stored_at FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row and row[1] >= now - self.ttl:
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return json.loads(row[0])
+            
+            self.misses += 1
+            return None
+
+    def put(self, key, analysis):
+        encoded = json.dumps(analysis, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            self._remember(key, encoded, now)
+            self.db.execute("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?)", (key, encoded, now))
+            self.db.commit()
+
+    def _remember(self, key, encoded, stored_at):
+        self.memory[key] = (encoded, stored_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'memory_entries': len(self.memory),
+            'prompt_version': PROMPT_VERSION
+        }
+
+
+class JSONLWriter:
+    """Streams records to a JSON Lines file as they are produced
+    
+    Records go to "<path>.part" and are flushed and fsynced one by one, so a
+    crash loses at most the record being written. close() renames the file to
+    its final name atomically. With append=True (daemon mode) records are
+    appended to path itself, so readers can follow it while it grows.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.append = append
+        self.tmp_path = path if append else path + ".part"
+        self.lock = threading.Lock()
+        self.count = 0
+        self.file = open(self.tmp_path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.count += 1
+
+    def close(self):
+        """Finish the file and move it into place"""
+        with self.lock:
+            self.file.close()
+            if not self.append:
+                os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Stop writing but leave the partial file behind for inspection/recovery"""
+        with self.lock:
+            self.file.close()
+
+
+class StatsBucket:
+    """Running counters for one group of articles"""
+
+    def __init__(self, top_k=10):
+        self.top_k = top_k
+        self.count = 0
+        self.avg_word_count = 0.0
+        self.sentiments = {'positive': 0, 'negative': 0, 'neutral': 0}
+        self.categories = set()
+        self.topic_counts = {}
+        self.first_seen = {}  # topic -> order of first appearance
+        self.top = {}
+        self._heap = []  # (count, -first_seen, topic), possibly stale
+
+    def add(self, article):
+        self.count += 1
+        self.avg_word_count += (article.get('word_count', 0) - self.avg_word_count) / self.count
+        self.categories.add(article.get('category', 'unknown'))
+        
+        sentiment = article.get('sentiment', 'neutral')
+        if sentiment in self.sentiments:
+            self.sentiments[sentiment] += 1
+        
+        for topic in article.get('topics', []):
+            if isinstance(topic, str):
+                self._count_topic(topic)
+
+    def _count_topic(self, topic):
+        count = self.topic_counts.get(topic, 0) + 1
+        self.topic_counts[topic] = count
+        if count == 1:
+            self.first_seen[topic] = len(self.first_seen)
+        
+        # Topics rank by (count, earlier first appearance), the order the
+        # baseline's stable sort gave. Counts only ever grow, so a bounded
+        # top-k stays exact: only the topic just counted can displace the
+        # weakest member. The heap goes stale as members' counts change and is
+        # cleaned up lazily when the weakest one is needed.
+        entry = (count, -self.first_seen[topic], topic)
+        if topic in self.top or len(self.top) < self.top_k:
+            self.top[topic] = count
+            heapq.heappush(self._heap, entry)
+            if len(self._heap) > 4 * self.top_k:
+                self._heap = [(n, -self.first_seen[t], t) for t, n in self.top.items()]
+                heapq.heapify(self._heap)
+            return
+        if not self.top:
+            return
+        weakest = self._weakest()
+        if entry > weakest:
+            heapq.heapreplace(self._heap, entry)
+            del self.top[weakest[2]]
+            self.top[topic] = count
+
+    def _weakest(self):
+        heap = self._heap
+        while self.top.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def sentiment_distribution(self):
+        return dict(self.sentiments)
+
+    def top_topics(self):
+        return sorted(self.top.items(), key=lambda item: (-item[1], self.first_seen[item[0]]))
+
+    def statistics(self):
+        return {
+            'avg_word_count': self.avg_word_count,
+            'sentiment_distribution': self.sentiment_distribution(),
+            'top_topics': self.top_topics()
+        }
+
+
+class CrawlStats:
+    """Incremental crawl statistics, updated once per analyzed article
+    
+    Keeps global and per-category counters so summaries are read straight from
+    the aggregator instead of re-scanning the article lists.
+    """
+
+    def __init__(self, top_k=10):
+        self.top_k = top_k
+        self.lock = threading.Lock()
+        self.global_stats = StatsBucket(top_k)
+        self.categories = {}
+
+    @classmethod
+    def from_articles(cls, articles, category=None):
+        stats = cls()
+        for article in articles:
+            stats.add(category, article)
+        return stats
+
+    def add(self, category, article):
+        with self.lock:
+            self.global_stats.add(article)
+            if category is not None:
+                if category not in self.categories:
+                    self.categories[category] = StatsBucket(self.top_k)
+                self.categories[category].add(article)
+
+    def category_statistics(self, category):
+        return self.categories[category].statistics()
+
+    def summary(self):
+        """Crawl-wide summary (same shape as the old generate_summary output)"""
+        stats = self.global_stats
+        if not stats.count:
+            return {}
+        
+        return {
+            'total_articles': stats.count,
+            'total_categories': len(stats.categories),
+            'avg_word_count': stats.avg_word_count,
+            'global_sentiment': stats.sentiment_distribution(),
+            'unique_topics': len(stats.topic_counts),
+            'all_topics': list(itertools.islice(stats.topic_counts, 20))
+        }
+
+
+RETRYABLE_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def failure_details(error):
+    """(status, retry_after_seconds) for a failed requests/aiohttp fetch"""
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status', None) or getattr(response, 'status_code', None)
+    headers = getattr(error, 'headers', None) or getattr(response, 'headers', None) or {}
+    return status, parse_retry_after(headers.get('Retry-After'))
+
+
+class HostRateLimiter:
+    """Per-host token bucket plus AIMD-adaptive concurrency
+    
+    Each host gets `rate` requests/sec with bursts up to `burst`. The number of
+    requests in flight per host grows by ~1 per window of successes (additive
+    increase) and halves on 429/5xx (multiplicative decrease). Retry-After
+    pauses the whole host.
+    """
+
+    def __init__(self, rate=5.0, burst=10, min_concurrency=1, max_concurrency=16, initial_concurrency=4):
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.initial_concurrency = initial_concurrency
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def _host(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = {
+                'tokens': float(self.burst),
+                'refilled_at': time.monotonic(),
+                'limit': float(self.initial_concurrency),
+                'in_flight': 0,
+                'paused_until': 0.0,
+                'requests': 0,
+                'throttled': 0,
+                'errors': 0,
+                'waits': 0
+            }
+        return state
+
+    def reserve(self, host):
+        """Take a slot for host; returns 0 when granted, else seconds to wait before asking again"""
+        now = time.monotonic()
+        with self.lock:
+            state = self._host(host)
+            if state['paused_until'] > now:
+                state['waits'] += 1
+                return state['paused_until'] - now
+            
+            state['tokens'] = min(self.burst, state['tokens'] + (now - state['refilled_at']) * self.rate)
+            state['refilled_at'] = now
+            if state['tokens'] < 1:
+                state['waits'] += 1
+                return (1 - state['tokens']) / self.rate
+            if state['in_flight'] >= int(state['limit']):
+                state['waits'] += 1
+                return 0.05
+            
+            state['tokens'] -= 1
+            state['in_flight'] += 1
+            state['requests'] += 1
+            return 0
+
+    def acquire(self, host):
+        while True:
+            wait = self.reserve(host)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, host):
+        while True:
+            wait = self.reserve(host)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, host, status=None, retry_after=None, error=False):
+        """Return the slot and adapt the host's concurrency to the outcome"""
+        with self.lock:
+            state = self._host(host)
+            state['in_flight'] = max(0, state['in_flight'] - 1)
+            
+            if status in RETRYABLE_STATUSES or error:
+                if status in RETRYABLE_STATUSES:
+                    state['throttled'] += 1
+                else:
+                    state['errors'] += 1
+                state['limit'] = max(self.min_concurrency, state['limit'] / 2)
+                if retry_after:
+                    state['paused_until'] = max(state['paused_until'], time.monotonic() + retry_after)
+            else:
+                state['limit'] = min(self.max_concurrency, state['limit'] + 1 / state['limit'])
+
+    def snapshot(self):
+        """Limiter state per host, for metrics"""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                host: {
+                    'concurrency_limit': round(state['limit'], 2),
+                    'in_flight': state['in_flight'],
+                    'tokens': round(min(self.burst, state['tokens'] + (now - state['refilled_at']) * self.rate), 2),
+                    'paused_for': round(max(0.0, state['paused_until'] - now), 2),
+                    'requests': state['requests'],
+                    'throttled': state['throttled'],
+                    'errors': state['errors'],
+                    'waits': state['waits']
+                }
+                for host, state in self.hosts.items()
+            }
+
+
+class RetryPolicy:
+    """Jittered exponential backoff with a crawl-wide retry budget
+    
+    Retries are allowed while they stay under `budget_ratio` of all requests
+    made (plus `min_retries`), so a struggling origin is not hit with a
+    retry storm. A server asking to wait longer than `max_delay` (Retry-After)
+    gets no retry: the fetch fails instead of holding its slot that long.
+    """
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=30.0, budget_ratio=0.2, min_retries=10):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+        self.retry_after_too_long = 0
+        self.lock = threading.Lock()
+
+    def record_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def retry_delay(self, attempt, status=None, retry_after=None):
+        """Seconds to wait before retry number attempt+1, or None to give up"""
+        if status is not None and status not in RETRYABLE_STATUSES:
+            return None
+        if attempt >= self.max_retries:
+            return None
+        
+        with self.lock:
+            if retry_after is not None and retry_after > self.max_delay:
+                self.retry_after_too_long += 1
+                return None
+            if self.retries >= self.min_retries + self.budget_ratio * self.requests:
+                self.budget_exhausted += 1
+                return None
+            self.retries += 1
+        
+        # Full jitter, but never earlier than the server asked for
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'budget_exhausted': self.budget_exhausted,
+                'retry_after_too_long': self.retry_after_too_long
+            }
+
+
+# Latency histogram bucket bounds in seconds (Prometheus-style, cumulative)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class CrawlMetrics:
+    """Thread-safe counters, gauges and latency histograms for the crawler
+    
+    Stages are timed with span(); each histogram also keeps a bounded sample
+    of recent observations so JSON snapshots can report p50/p95. With
+    tracing on, every span that carries a trace_id (the article URL) is kept
+    as a trace record. Export with snapshot() (JSON) or prometheus() (text
+    exposition format).
+    """
+
+    def __init__(self, tracing=False, max_spans=100000, buckets=LATENCY_BUCKETS, max_samples=2048):
+        self.buckets = tuple(buckets)
+        self.max_samples = max_samples
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.spans = deque(maxlen=max_spans) if tracing else None
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_counter(self, name, value, **labels):
+        """Set a counter maintained elsewhere (e.g. cache hit totals)"""
+        with self.lock:
+            self.counters[self._key(name, labels)] = value
+
+    def set_gauge(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            gauge = self.gauges.get(key)
+            if gauge is None:
+                self.gauges[key] = [value, value]
+            else:
+                gauge[0] = value
+                gauge[1] = max(gauge[1], value)
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': [0] * len(self.buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                    'max': 0.0,
+                    'samples': deque(maxlen=self.max_samples)
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+            histogram['max'] = max(histogram['max'], value)
+            histogram['samples'].append(value)
+
+    def record_error(self, stage, error):
+        """Count an error by stage and type (HTTP status when there is one)"""
+        status = failure_details(error)[0]
+        kind = f"http_{status}" if status else type(error).__name__
+        self.inc('errors_total', stage=stage, type=kind)
+
+    @contextlib.contextmanager
+    def span(self, stage, trace_id=None, **attributes):
+        """Time a block as one stage; errors are counted and re-raised"""
+        start = time.perf_counter()
+        started_at = time.time()
+        error = None
+        try:
+            yield attributes
+        except BaseException as e:
+            error = e
+            self.record_error(stage, e)
+            raise
+        finally:
+            self.record_span(stage, time.perf_counter() - start, trace_id, started_at, error, **attributes)
+
+    def record_span(self, stage, duration, trace_id=None, started_at=None, error=None, **attributes):
+        """Record a stage timing measured by the caller (and its trace span, if tracing)"""
+        self.observe('stage_seconds', duration, stage=stage)
+        if self.spans is None or trace_id is None:
+            return
+        record = {
+            'trace_id': trace_id,
+            'stage': stage,
+            'start': round(started_at or time.time() - duration, 6),
+            'duration': round(duration, 6),
+            'thread': threading.current_thread().name
+        }
+        if attributes:
+            record['attributes'] = attributes
+        if error is not None:
+            record['error'] = type(error).__name__
+        self.spans.append(record)
+
+    @staticmethod
+    def _label_text(labels):
+        return ','.join(f"{key}={value}" for key, value in labels)
+
+    @staticmethod
+    def _quantile(samples, q):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def _total(self, name, **match):
+        return sum(value for (key, labels), value in self.counters.items()
+                   if key == name and all((k, str(v)) in labels for k, v in match.items()))
+
+    def snapshot(self, include_spans=False):
+        """JSON-ready view of every metric, with p50/p95 per histogram"""
+        with self.lock:
+            data = {'uptime_seconds': round(time.time() - self.started, 3),
+                    'counters': {}, 'gauges': {}, 'histograms': {}}
+            for (name, labels), value in sorted(self.counters.items()):
+                data['counters'].setdefault(name, {})[self._label_text(labels)] = value
+            for (name, labels), (value, peak) in sorted(self.gauges.items()):
+                data['gauges'].setdefault(name, {})[self._label_text(labels)] = {'value': value, 'max': peak}
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                samples = histogram['samples']
+                data['histograms'].setdefault(name, {})[self._label_text(labels)] = {
+                    'count': histogram['count'],
+                    'sum': round(histogram['sum'], 6),
+                    'mean': round(histogram['sum'] / histogram['count'], 6),
+                    'p50': round(self._quantile(samples, 0.50), 6),
+                    'p95': round(self._quantile(samples, 0.95), 6),
+                    'max': round(histogram['max'], 6)
+                }
+            
+            # Rates the raw counters do not show directly
+            derived = {}
+            generation = self._total('ollama_generation_seconds_total')
+            if generation:
+                derived['ollama_tokens_per_sec'] = round(self._total('ollama_tokens_total') / generation, 2)
+            for cache in ('http', 'analysis'):
+                hits = self._total('cache_hits_total', cache=cache)
+                lookups = hits + self._total('cache_misses_total', cache=cache)
+                if lookups:
+                    derived[f'{cache}_cache_hit_rate'] = round(hits / lookups, 4)
+            derived['bytes_downloaded'] = self._total('bytes_downloaded_total')
+            derived['errors'] = self._total('errors_total')
+            data['derived'] = derived
+            
+            if include_spans and self.spans is not None:
+                data['spans'] = list(self.spans)
+        return data
+
+    def prometheus(self, prefix="crawler"):
+        """Metrics in the Prometheus text exposition format"""
+        def labels_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+            return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+        
+        lines = []
+        with self.lock:
+            for kind, store in (('counter', self.counters), ('gauge', self.gauges)):
+                typed = set()
+                for (name, labels), value in sorted(store.items()):
+                    metric = f"{prefix}_{name}"
+                    if metric not in typed:
+                        typed.add(metric)
+                        lines.append(f"# TYPE {metric} {kind}")
+                    if kind == 'gauge':
+                        value = value[0]
+                    lines.append(f"{metric}{labels_text(labels)} {value}")
+            
+            typed = set()
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = f"{prefix}_{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram['buckets']):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{labels_text(labels, [('le', repr(bound))])} {cumulative}")
+                lines.append(f"{metric}_bucket{labels_text(labels, [('le', '+Inf')])} {histogram['count']}")
+                lines.append(f"{metric}_sum{labels_text(labels)} {histogram['sum']}")
+                lines.append(f"{metric}_count{labels_text(labels)} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _is_client_error(error):
+    """True for Ollama 4xx replies, where failing over to another endpoint cannot help"""
+    status = getattr(error, 'status_code', None)
+    return isinstance(status, int) and 400 <= status < 500
+
+
+class OllamaPool:
+    """Least-outstanding-requests balancer over several Ollama endpoints
+    
+    Exposes the chat/show/list calls the crawler uses, so it stands in for a
+    single ollama.Client. Each request goes to the healthy endpoint with the
+    fewest requests in flight relative to its concurrency cap, waiting when
+    every endpoint is full. After `max_failures` consecutive errors an endpoint
+    is ejected for `eject_seconds`; it only rejoins once a health check
+    (a cheap /api/tags call) succeeds. Failed requests move on to the next
+    endpoint.
+    """
+
+    def __init__(self, hosts=None, max_concurrency=2, max_failures=3, eject_seconds=30.0,
+                 health_timeout=5.0, request_timeout=None):
+        # hosts: list of URLs, or {url: cap}; None means the default OLLAMA_HOST
+        if not hosts:
+            hosts = [None]
+        if not isinstance(hosts, dict):
+            hosts = {host: max_concurrency for host in hosts}
+        
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.request_timeout = request_timeout
+        self.health_timeout = health_timeout
+        self.endpoints = [
+            {
+                'host': host or os.environ.get('OLLAMA_HOST', 'http://127.0.0.1:11434'),
+                'url': host,
+                'client': None,
+                'probe': None,
+                'cap': max(1, int(cap)),
+                'in_flight': 0,
+                'requests': 0,
+                'failures': 0,
+                'errors': 0,
+                'ejections': 0,
+                'ejected_until': 0.0,
+                'probing': False
+            }
+            for host, cap in hosts.items()
+        ]
+        self.condition = threading.Condition()
+
+    def _client(self, endpoint, kind='client'):
+        # Clients (and the ollama package) are created on first use
+        if endpoint[kind] is None:
+            import ollama
+            timeout = self.health_timeout if kind == 'probe' else self.request_timeout
+            endpoint[kind] = ollama.Client(host=endpoint['url'], timeout=timeout)
+        return endpoint[kind]
+
+    @property
+    def capacity(self):
+        """Total concurrent requests across all endpoints"""
+        return sum(endpoint['cap'] for endpoint in self.endpoints)
+
+    def _pick(self, exclude):
+        """Least-loaded endpoint with a free slot, or an ejected one due a health check"""
+        now = time.monotonic()
+        best = None
+        for endpoint in self.endpoints:
+            if endpoint['host'] in exclude or endpoint['in_flight'] >= endpoint['cap']:
+                continue
+            if endpoint['ejected_until']:
+                if endpoint['ejected_until'] <= now and not endpoint['probing']:
+                    endpoint['probing'] = True
+                    return endpoint, True
+                continue
+            load = (endpoint['in_flight'] / endpoint['cap'], endpoint['requests'])
+            if best is None or load < best[0]:
+                best = (load, endpoint)
+        return (best[1], False) if best else (None, False)
+
+    def acquire(self, exclude=()):
+        """Block until an endpoint has a free slot; returns it, or None if none is usable
+        
+        Waits while healthy endpoints are merely busy, but fails fast when every
+        endpoint is excluded or ejected, so callers can fall back immediately.
+        """
+        while True:
+            with self.condition:
+                while True:
+                    endpoint, needs_probe = self._pick(exclude)
+                    if endpoint is not None:
+                        break
+                    if not any(e['host'] not in exclude and (not e['ejected_until'] or e['probing'])
+                               for e in self.endpoints):
+                        return None
+                    self.condition.wait()
+                
+                if not needs_probe:
+                    endpoint['in_flight'] += 1
+                    endpoint['requests'] += 1
+                    return endpoint
+            
+            # Health check outside the lock, then pick again
+            self.check_endpoint(endpoint)
+
+    def release(self, endpoint, error=None):
+        """Return an endpoint's slot, counting the outcome towards ejection"""
+        with self.condition:
+            endpoint['in_flight'] -= 1
+            if error is None:
+                endpoint['failures'] = 0
+            else:
+                endpoint['errors'] += 1
+                endpoint['failures'] += 1
+                if endpoint['failures'] >= self.max_failures and not endpoint['ejected_until']:
+                    endpoint['ejected_until'] = time.monotonic() + self.eject_seconds
+                    endpoint['ejections'] += 1
+                    print(f" Ejecting Ollama endpoint {endpoint['host']} for {self.eject_seconds:.0f}s after {endpoint['failures']} failures")
+            self.condition.notify_all()
+
+    def check_endpoint(self, endpoint):
+        """Health-check one endpoint; a healthy one is (re)admitted, a failing one stays out"""
+        try:
+            self._client(endpoint, 'probe').list()
+            healthy = True
+        except Exception:
+            healthy = False
+        
+        with self.condition:
+            endpoint['probing'] = False
+            if healthy:
+                if endpoint['ejected_until']:
+                    print(f" Ollama endpoint {endpoint['host']} is healthy again")
+                endpoint['ejected_until'] = 0.0
+                endpoint['failures'] = 0
+            else:
+                endpoint['ejected_until'] = time.monotonic() + self.eject_seconds
+            self.condition.notify_all()
+        return healthy
+
+    def check_health(self):
+        """Health-check every endpoint; returns {host: healthy}"""
+        results = {}
+        for endpoint in self.endpoints:
+            with self.condition:
+                endpoint['probing'] = True
+            results[endpoint['host']] = self.check_endpoint(endpoint)
+        return results
+
+    def call(self, method, *args, **kwargs):
+        """Run a client method on the least-loaded endpoint, failing over on errors"""
+        tried = set()
+        last_error = None
+        while True:
+            endpoint = self.acquire(exclude=tried)
+            if endpoint is None:
+                raise last_error or ConnectionError("No healthy Ollama endpoint available")
+            tried.add(endpoint['host'])
+            
+            try:
+                result = getattr(self._client(endpoint), method)(*args, **kwargs)
+            except Exception as e:
+                self.release(endpoint, e)
+                last_error = e
+                if _is_client_error(e):
+                    raise  # The request itself is bad; another endpoint would say the same
+                continue
+            self.release(endpoint)
+            return result
+
+    def _stream(self, kwargs):
+        # The slot is held until the caller finishes or closes the stream; only
+        # a failure before the first chunk may move on to another endpoint
+        tried = set()
+        last_error = None
+        while True:
+            endpoint = self.acquire(exclude=tried)
+            if endpoint is None:
+                raise last_error or ConnectionError("No healthy Ollama endpoint available")
+            tried.add(endpoint['host'])
+            
+            started = False
+            try:
+                for chunk in self._client(endpoint).chat(stream=True, **kwargs):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                self.release(endpoint)
+                raise
+            except Exception as e:
+                self.release(endpoint, e)
+                last_error = e
+                if started or _is_client_error(e):
+                    raise
+                continue
+            self.release(endpoint)
+            return
+
+    def chat(self, stream=False, **kwargs):
+        if stream:
+            return self._stream(kwargs)
+        return self.call('chat', **kwargs)
+
+    def show(self, *args, **kwargs):
+        return self.call('show', *args, **kwargs)
+
+    def list(self):
+        return self.call('list')
+
+    def warm_up(self, model, keep_alive="30m"):
+        """Check that every endpoint has model, then load it into memory
+        
+        show() is the readiness check (no inference); an empty generate with
+        keep_alive makes Ollama load the weights and keep them resident.
+        Endpoints warm up in parallel. Returns {host: error or None}.
+        """
+        def warm(endpoint):
+            try:
+                client = self._client(endpoint)
+                client.show(model)
+                client.generate(model=model, prompt='', keep_alive=keep_alive)
+                return None
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=len(self.endpoints)) as executor:
+            errors = list(executor.map(warm, self.endpoints))
+        return {endpoint['host']: error for endpoint, error in zip(self.endpoints, errors)}
+
+    def snapshot(self):
+        """Per-endpoint load and health, for metrics"""
+        now = time.monotonic()
+        with self.condition:
+            return {
+                endpoint['host']: {
+                    'cap': endpoint['cap'],
+                    'in_flight': endpoint['in_flight'],
+                    'requests': endpoint['requests'],
+                    'errors': endpoint['errors'],
+                    'ejections': endpoint['ejections'],
+                    'ejected_for': round(max(0.0, endpoint['ejected_until'] - now), 2)
+                }
+                for endpoint in self.endpoints
+            }
+
+
+class NearDuplicateIndex:
+    """SimHash fingerprints with a banded LSH index for near-duplicate articles
+    
+    Fingerprints are split into max_distance + 1 bands. Two fingerprints within
+    max_distance bits of each other must agree on at least one whole band, so
+    only articles sharing a band bucket are compared.
+    """
+
+    def __init__(self, max_distance=6, shingle_size=3):
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.bands = max_distance + 1
+        self.band_bits = 64 // self.bands
+        self.buckets = [{} for _ in range(self.bands)]
+        self.fingerprints = {}
+        self.cluster_sizes = {}
+        self.lock = threading.Lock()
+
+    def fingerprint(self, text):
+        """64-bit SimHash over word shingles"""
+        words = re.findall(r'\w+', text.lower())
+        k = self.shingle_size
+        shingles = {' '.join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+        
+        weights = [0] * 64
+        for shingle in shingles:
+            h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+            for bit in range(64):
+                weights[bit] += 1 if (h >> bit) & 1 else -1
+        return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def find_or_add(self, key, text):
+        """Return the representative key this text duplicates, or None after registering it as a new one"""
+        fingerprint = self.fingerprint(text)
+        band_keys = self._band_keys(fingerprint)
+        
+        with self.lock:
+            for band, band_key in enumerate(band_keys):
+                for candidate in self.buckets[band].get(band_key, ()):
+                    if bin(fingerprint ^ self.fingerprints[candidate]).count('1') <= self.max_distance:
+                        self.cluster_sizes[candidate] += 1
+                        return candidate
+            
+            self.fingerprints[key] = fingerprint
+            self.cluster_sizes[key] = 1
+            for band, band_key in enumerate(band_keys):
+                self.buckets[band].setdefault(band_key, []).append(key)
+            return None
+
+    def stats(self):
+        with self.lock:
+            sizes = list(self.cluster_sizes.values())
+        return {
+            'articles': sum(sizes),
+            'clusters': len(sizes),
+            'duplicates': sum(sizes) - len(sizes),
+            'largest_cluster': max(sizes) if sizes else 0,
+            'max_distance': self.max_distance
+        }
+
+
+# URLs a crawl frontier remembers for deduplication; only a long-running daemon
+# gets near it, and older URLs then fall back to the article index
+SEEN_URL_LIMIT = 100000
+
+
+class RecrawlScheduler:
+    """Adaptive re-poll schedule for discovery pages (daemon mode)
+
+    Seeds sit in a heap keyed by their next poll time. A poll that finds links
+    the page did not list last time halves the seed's interval; one that finds
+    nothing new (or fails) multiplies it by `backoff`, always within
+    [min_interval, max_interval]. Busy pages like /news end up polled every
+    few minutes, quiet ones like /travel about hourly. A seed is out of the heap
+    while it is being polled, so it is never polled twice at once.
+    """
+
+    def __init__(self, seeds, initial_interval=300.0, min_interval=60.0, max_interval=3600.0, backoff=1.5):
+        # seeds: (category, url, source, max_age_hours) tuples, all due at once
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.sequence = itertools.count()
+        self.heap = []
+        self.seeds = {}
+        now = time.monotonic()
+        for category, url, source, max_age_hours in seeds:
+            self.seeds[url] = {
+                'category': category,
+                'source': source,
+                'max_age_hours': max_age_hours,
+                'interval': min(max(initial_interval, min_interval), max_interval),
+                'next_poll': now,
+                'links': None,
+                'polls': 0,
+                'changes': 0,
+                'errors': 0,
+                'new_links': 0
+            }
+            heapq.heappush(self.heap, (now, next(self.sequence), url))
+
+    def next_due(self):
+        """Block until a seed is due; returns (category, url, source, max_age_hours), or None once stopped"""
+        with self.condition:
+            while not self.stopped:
+                wait = None
+                if self.heap:
+                    wait = self.heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        _, _, url = heapq.heappop(self.heap)
+                        seed = self.seeds[url]
+                        return seed['category'], url, seed['source'], seed['max_age_hours']
+                self.condition.wait(wait)
+            return None
+
+    def record(self, url, links):
+        """Reschedule a polled seed from what it listed (links=None for a failed poll); returns the new links"""
+        with self.condition:
+            seed = self.seeds[url]
+            seed['polls'] += 1
+            new = []
+            if links is None:
+                seed['errors'] += 1
+            else:
+                # The first poll only sets the baseline
+                if seed['links'] is not None:
+                    new = [link for link in links if link not in seed['links']]
+                seed['links'] = frozenset(links)
+            
+            if new:
+                seed['changes'] += 1
+                seed['new_links'] += len(new)
+                seed['interval'] = max(self.min_interval, seed['interval'] / 2)
+            else:
+                seed['interval'] = min(self.max_interval, seed['interval'] * self.backoff)
+            seed['next_poll'] = time.monotonic() + seed['interval']
+            heapq.heappush(self.heap, (seed['next_poll'], next(self.sequence), url))
+            self.condition.notify()
+            return new
+
+    def stop(self):
+        """Wake every waiting poller; next_due() returns None from now on"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.condition:
+            return {
+                url: {
+                    'category': seed['category'],
+                    'interval': round(seed['interval'], 1),
+                    'next_poll_in': round(max(0.0, seed['next_poll'] - now), 1),
+                    'polls': seed['polls'],
+                    'changes': seed['changes'],
+                    'new_links': seed['new_links'],
+                    'errors': seed['errors']
+                }
+                for url, seed in self.seeds.items()
+            }
+
+
+class CrawlFrontier:
+    """Bounded priority queue of article URLs waiting to be extracted
+
+    Links from seed pages enter at depth 1 and links found inside extracted
+    articles one level deeper, up to max_depth. Each URL is scored by its
+    category weight, its position on the page it was found on (earlier links
+    are more prominent) and its depth, and the best-scored URL is handed out
+    first. Categories stop taking URLs once their quota is used. At most
+    max_size URLs are queued; beyond that the lowest-scored ones are dropped,
+    and deduplication remembers a bounded window of URLs, so memory stays
+    flat however many links a crawl runs into.
+    
+    With revisit_after (seconds; daemon mode) a URL pushed that long ago may be
+    queued again, so pages still listed on a seed get re-checked. Revisits
+    score as one level deeper, so new links go first.
+    """
+
+    def __init__(self, max_depth=1, quotas=None, category_weights=None, max_size=200000, depth_decay=0.5,
+                 revisit_after=None):
+        self.max_depth = max_depth
+        self.quotas = quotas or {}  # {category: max URLs handed out}; missing = unlimited
+        self.category_weights = category_weights or {}
+        self.max_size = max_size
+        self.depth_decay = depth_decay
+        self.revisit_after = revisit_after
+        self.seen_limit = max(SEEN_URL_LIMIT, 2 * max_size)
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.heap = []  # (-score, sequence, url, category, depth)
+        self.seen = OrderedDict()  # url -> when it was last queued (time.monotonic())
+        self.taken = {}
+        self.active = 0
+        self.stats = {'pushed': 0, 'revisits': 0, 'duplicates': 0, 'too_deep': 0, 'over_quota': 0, 'trimmed': 0,
+                      'max_queued': 0}
+
+    def score(self, category, position, depth, link_category=None):
+        weight = self.category_weights.get(link_category, self.category_weights.get(category, 1.0))
+        return weight * self.depth_decay ** (depth - 1) / (1.0 + position / 10.0)
+
+    def _full(self, category):
+        quota = self.quotas.get(category)
+        return quota is not None and self.taken.get(category, 0) >= quota
+
+    def push(self, links, category, depth):
+        """Queue classified links [(canonical_url, link_category)] in page order; returns how many were added"""
+        with self.condition:
+            if depth > self.max_depth:
+                self.stats['too_deep'] += len(links)
+                return 0
+            if self._full(category):
+                self.stats['over_quota'] += len(links)
+                return 0
+            
+            added = 0
+            now = time.monotonic()
+            for position, (url, link_category) in enumerate(links):
+                queued_at = self.seen.get(url)
+                revisit = queued_at is not None
+                if revisit:
+                    if self.revisit_after is None or now - queued_at < self.revisit_after:
+                        self.stats['duplicates'] += 1
+                        continue
+                    self.seen.move_to_end(url)
+                    self.stats['revisits'] += 1
+                self.seen[url] = now
+                if len(self.seen) > self.seen_limit:
+                    self.seen.popitem(last=False)
+                score = self.score(category, position, depth + revisit, link_category)
+                heapq.heappush(self.heap, (-score, next(self.sequence), url, category, depth))
+                added += 1
+            
+            self.stats['pushed'] += added
+            # Trim in batches so pushes stay O(log n) on average
+            if len(self.heap) > self.max_size * 1.1:
+                # A sorted list is a valid heap, so cutting its tail keeps the best
+                self.heap.sort()
+                self.stats['trimmed'] += len(self.heap) - self.max_size
+                del self.heap[self.max_size:]
+            self.stats['max_queued'] = max(self.stats['max_queued'], len(self.heap))
+            if added:
+                self.condition.notify_all()
+            return added
+
+    def pop(self, timeout=None):
+        """Best-scored (url, category, depth), or None if nothing is queued within timeout
+        
+        Every URL handed out counts as active until done() is called for it.
+        """
+        with self.condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                while self.heap:
+                    _, _, url, category, depth = heapq.heappop(self.heap)
+                    if self._full(category):
+                        self.stats['over_quota'] += 1
+                        continue
+                    self.taken[category] = self.taken.get(category, 0) + 1
+                    self.active += 1
+                    return url, category, depth
+                
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def done(self):
+        """Mark one handed-out URL as finished (its links, if any, already pushed)"""
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    def idle(self):
+        """True when nothing is queued and no handed-out URL is still being processed"""
+        with self.condition:
+            return not self.heap and not self.active
+
+    def clear(self):
+        """Drop everything still queued (URLs already handed out are unaffected)"""
+        with self.condition:
+            self.heap = []
+            self.condition.notify_all()
+
+    def snapshot(self):
+        with self.condition:
+            return dict(self.stats, queued=len(self.heap), active=self.active, taken=dict(self.taken))
+
+
+# Chunk size for streamed downloads; small enough that reading stops soon
+# after an extractor's content budget is met
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+def stream_into(sink, chunks, keep_body=False):
+    """Feed chunks to sink until it is satisfied, then close it
+    
+    Returns the bytes read when keep_body is set (the whole body, or only the
+    prefix the sink needed if sink.truncated), otherwise None.
+    """
+    kept = [] if keep_body else None
+    for chunk in chunks:
+        sink.feed(chunk)
+        if kept is not None:
+            kept.append(chunk)
+        if sink.satisfied:
+            sink.truncated = True
+            break
+    sink.close()
+    return b''.join(kept) if kept is not None else None
+
+
+def record_fetch(metrics, url, body, duration, error=None):
+    """Record one fetch attempt: network time (streamed parsing excluded) and bytes"""
+    if error is not None:
+        metrics.record_error('fetch', error)
+        metrics.record_span('fetch', duration, url, error=error)
+        return
+    if isinstance(body, bytes):
+        size = len(body)
+    else:
+        size = body.bytes_read
+        duration -= body.parse_seconds
+    metrics.inc('bytes_downloaded_total', size)
+    metrics.record_span('fetch', max(0.0, duration), url, bytes=size)
+
+
+def with_origin(url, origin):
+    """url with its scheme and host swapped for origin's (e.g. http://127.0.0.1:8000)"""
+    if not origin:
+        return url
+    parts = urlsplit(url)
+    base = urlsplit(origin)
+    return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+
+def iter_chunks(body, chunk_size=STREAM_CHUNK_SIZE):
+    """Split an in-memory body into stream-sized chunks"""
+    view = memoryview(body)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
+
+
+class AsyncFetchEngine:
+    """asyncio/aiohttp page fetcher with one shared connection pool
+
+    The event loop runs on its own thread and keeps a single ClientSession
+    (one connector, so the global and per-host limits hold across calls) for
+    the engine's lifetime; fetch_all() and fetch_url() may be called from any
+    thread. Parsing and HTTPCache reads/writes run in the loop's default
+    executor so they never stall the other requests in flight. close() stops
+    the loop.
+    """
+
+    def __init__(self, headers, max_concurrency=64, max_per_host=8, timeout=20, cache=None,
+                 rate_limiter=None, retry_policy=None, on_failure=None, origin=None, metrics=None):
+        self.headers = dict(headers)
+        self.origin = origin
+        self.metrics = metrics
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.on_failure = on_failure
+        self.lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._session = None
+
+    def _ensure_loop(self):
+        with self.lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="fetch-loop", daemon=True)
+                self._thread.start()
+                # Close the session cleanly even if the owner never calls close()
+                atexit.register(self.close)
+            return self._loop
+
+    def _run(self, coro):
+        """Run a coroutine on the engine's loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def _get_session(self):
+        # Only ever called on the loop thread
+        if self._session is None:
+            import aiohttp
+            # The connector enforces both the global and the per-host limits, so
+            # every URL can be scheduled at once without spawning extra workers.
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.max_per_host)
+            self._session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        return self._session
+    
+    async def _close_session(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def close(self):
+        """Close the session and stop the loop thread (a later fetch starts them again)"""
+        with self.lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        atexit.unregister(self.close)
+        asyncio.run_coroutine_threadsafe(self._close_session(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    @staticmethod
+    def _feed(sink, chunk):
+        sink.feed(chunk)
+        return sink.satisfied
+
+    async def _fetch_once(self, url, client_timeout, sink_factory=None):
+        session = self._get_session()
+        headers = {}
+        if self.cache:
+            headers = await asyncio.to_thread(self.cache.conditional_headers, url, sink_factory is not None)
+        target = with_origin(url, self.origin)
+        async with session.get(target, timeout=client_timeout, headers=headers) as response:
+            if response.status == 304 and self.cache:
+                cached = await asyncio.to_thread(self.cache.replay, url, sink_factory)
+                if cached is not None:
+                    return cached
+                # Cached body unusable - fall back to a full download
+                async with session.get(target, timeout=client_timeout) as full_response:
+                    return await self._read(url, full_response, sink_factory)
+            
+            return await self._read(url, response, sink_factory)
+
+    async def _read(self, url, response, sink_factory):
+        response.raise_for_status()
+        if not sink_factory:
+            body = await response.read()
+            if self.cache:
+                await asyncio.to_thread(self.cache.store, url, body, response.headers)
+            return body
+        
+        # Leaving the response context early drops the connection, so nothing
+        # past the extractor's budget is downloaded
+        sink = sink_factory()
+        kept = [] if self.cache else None
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            if kept is not None:
+                kept.append(chunk)
+            if await asyncio.to_thread(self._feed, sink, chunk):
+                sink.truncated = True
+                break
+        await asyncio.to_thread(sink.close)
+        if kept is not None:
+            # A cut-short prefix is cached too, so the next fetch can be conditional
+            await asyncio.to_thread(self.cache.store, url, b''.join(kept), response.headers, not sink.truncated)
+        return sink
+
+    async def fetch(self, url, timeout=None, sink_factory=None):
+        """Fetch a single URL with rate limiting and retries, returning the body bytes or None
+        
+        With sink_factory the body is streamed into a fresh sink (an extractor)
+        per attempt and the sink is returned instead of the bytes.
+        """
+        import aiohttp
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        host = urlsplit(url).netloc
+        attempt = 0
+        
+        while True:
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async(host)
+            if self.retry_policy:
+                self.retry_policy.record_request()
+            
+            start = time.perf_counter()
+            try:
+                body = await self._fetch_once(url, client_timeout, sink_factory)
+                if self.rate_limiter:
+                    self.rate_limiter.release(host, 200)
+                if self.metrics:
+                    record_fetch(self.metrics, url, body, time.perf_counter() - start)
+                return body
+            except Exception as e:
+                if self.metrics:
+                    record_fetch(self.metrics, url, None, time.perf_counter() - start, e)
+                status, retry_after = failure_details(e)
+                if self.rate_limiter:
+                    self.rate_limiter.release(host, status, retry_after, error=status is None)
+                
+                delay = self.retry_policy.retry_delay(attempt, status, retry_after) if self.retry_policy else None
+                if delay is None:
+                    print(f" Error fetching {url}: {e}")
+                    if self.on_failure:
+                        self.on_failure(url, e)
+                    return None
+                
+                attempt += 1
+                print(f" Retrying {url} in {delay:.1f}s (attempt {attempt}, {status or type(e).__name__})")
+                await asyncio.sleep(delay)
+
+    async def _fetch_all(self, urls, timeout=None, sink_factory=None):
+        bodies = await asyncio.gather(*(self.fetch(url, timeout, sink_factory) for url in urls))
+        return list(zip(urls, bodies))
+
+    def fetch_all(self, urls, timeout=None, sink_factory=None):
+        """Fetch all URLs concurrently, returning (url, body or None) pairs in input order"""
+        if not urls:
+            return []
+        return self._run(self._fetch_all(list(urls), timeout, sink_factory))
+
+    def submit(self, url, timeout=None, sink_factory=None):
+        """Start fetching url on the engine's loop; returns a concurrent.futures.Future of fetch()'s result"""
+        return asyncio.run_coroutine_threadsafe(self.fetch(url, timeout, sink_factory), self._ensure_loop())
+
+    def fetch_url(self, url, timeout=None, sink_factory=None):
+        """Fetch one URL from a worker thread; requests from all threads share the session"""
+        return self.submit(url, timeout, sink_factory).result()
+
+
+# Selector sets used for article and category pages, in priority order
+TITLE_SELECTORS = [
+    'h1[data-testid="headline"]',
+    'h1.story-body__h1',
+    'h1',
+    '.story-headline h1',
+    '[data-testid="headline"]'
+]
+
+CONTENT_SELECTORS = [
+    '[data-component="text-block"]',
+    '.story-body__inner p',
+    '.ssrcss-uf6wea-RichTextComponentWrapper p',
+    'div[data-component="text-block"] p',
+    '.gel-body-copy p',
+    'p'
+]
+
+LINK_SELECTORS = [
+    'a[href*="/news/"]',
+    'a[href*="/sport/"]',
+    'a[href*="/culture/"]',
+    'a[data-testid="internal-link"]',
+    '.gs-c-promo-heading a',
+    '.media__link',
+    '[class*="promo"] a[href]',
+    '.story-link',
+    'h2 a[href], h3 a[href]'
+]
+
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+])
+
+# Opening one of these implicitly closes an open <p> (HTML parsing rules)
+P_CLOSING_TAGS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'div', 'dl', 'fieldset',
+    'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header',
+    'hr', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'ul'
+])
+
+_COMPOUND_RE = re.compile(r'^([a-zA-Z][a-zA-Z0-9]*)?((?:\.[\w-]+|\[[^\]]+\])*)$')
+_COMPOUND_PART_RE = re.compile(r'\.([\w-]+)|\[([\w-]+)(?:([*]?=)"([^"]*)")?\]')
+
+
+class CompiledSelectors:
+    """A list of simple CSS selectors compiled once and indexed by tag name
+
+    Supports what the BBC selector sets use: tag, .class, [attr], [attr="v"],
+    [attr*="v"], descendant combinators and comma-separated groups.
+    """
+
+    def __init__(self, selectors):
+        self.selectors = list(selectors)
+        self.by_tag = {}
+        self.any_tag = []
+        
+        for index, selector in enumerate(self.selectors):
+            for alternative in selector.split(','):
+                chain = [self._compile_compound(part) for part in alternative.split()]
+                tag = chain[-1][0]
+                if tag:
+                    self.by_tag.setdefault(tag, []).append((index, chain))
+                else:
+                    self.any_tag.append((index, chain))
+
+    @staticmethod
+    def _compile_compound(text):
+        match = _COMPOUND_RE.match(text.strip())
+        if not match:
+            raise ValueError(f"Unsupported selector: {text!r}")
+        
+        classes = []
+        attr_tests = []
+        for class_name, attr, op, value in _COMPOUND_PART_RE.findall(match.group(2)):
+            if class_name:
+                classes.append(class_name)
+            else:
+                attr_tests.append((attr, op, value))
+        return (match.group(1) and match.group(1).lower(), frozenset(classes), tuple(attr_tests))
+
+    @staticmethod
+    def _match_compound(compound, node):
+        tag, classes, attr_tests = compound
+        if tag and node[0] != tag:
+            return False
+        if classes and not classes <= node[2]:
+            return False
+        
+        attrs = node[1]
+        for attr, op, value in attr_tests:
+            actual = attrs.get(attr)
+            if actual is None:
+                return False
+            if op == '=' and actual != value:
+                return False
+            if op == '*=' and value not in actual:
+                return False
+        return True
+
+    def match(self, node, ancestors):
+        """Return the indices of all selectors matching node, given its open ancestors"""
+        candidates = self.by_tag.get(node[0], [])
+        if self.any_tag:
+            candidates = candidates + self.any_tag
+        
+        matched = []
+        for index, chain in candidates:
+            if index in matched or not self._match_compound(chain[-1], node):
+                continue
+            
+            # Descendant combinators only, so a greedy walk up the stack is exact
+            remaining = len(chain) - 2
+            for ancestor in reversed(ancestors):
+                if remaining < 0:
+                    break
+                if self._match_compound(chain[remaining], ancestor):
+                    remaining -= 1
+            if remaining < 0:
+                matched.append(index)
+        return matched
+
+
+COMPILED_TITLE_SELECTORS = CompiledSelectors(TITLE_SELECTORS)
+COMPILED_CONTENT_SELECTORS = CompiledSelectors(CONTENT_SELECTORS)
+COMPILED_LINK_SELECTORS = CompiledSelectors(LINK_SELECTORS)
+
+
+class _StdlibEventParser(HTMLParser):
+    """Forwards html.parser events to a SinglePassExtractor"""
+
+    def __init__(self, sink):
+        super().__init__(convert_charrefs=True)
+        self.sink = sink
+
+    def handle_starttag(self, tag, attrs):
+        self.sink.start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self.sink.start(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.sink.end(tag)
+
+    def handle_endtag(self, tag):
+        self.sink.end(tag)
+
+    def handle_data(self, data):
+        self.sink.data(data)
+
+
+class SinglePassExtractor:
+    """Gathers title, paragraphs and links from a page in a single parse
+
+    Every element is tested once against the compiled title, content and link
+    selector sets while the document streams through the parser, instead of
+    running one full-tree select() per selector. backend is "html.parser"
+    (stdlib) or "lxml" (faster, optional).
+    """
+
+    def __init__(self, backend="html.parser", want_article=True, content_budget=None,
+                 min_paragraphs=5):
+        self.backend = backend
+        self.want_article = want_article
+        self.content_budget = content_budget
+        self.min_paragraphs = min_paragraphs
+        self.bytes_read = 0
+        self.parse_seconds = 0.0
+        self.truncated = False
+        self.stack = []
+        self.nodes = []
+        self.capturing = []
+        self.title_matches = {}
+        self.content_matches = [[] for _ in CONTENT_SELECTORS]
+        self.links = []
+        self._seen_links = set()
+        self._in_text = False  # last event was data: the next data continues that text node
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        
+        if backend == "lxml":
+            self._parser = lxml_etree.HTMLPullParser(events=('start', 'end'))
+        else:
+            self._parser = _StdlibEventParser(self)
+
+    def feed(self, chunk):
+        """Feed the next piece of the document (bytes or str)"""
+        start = time.perf_counter()
+        if isinstance(chunk, bytes):
+            self.bytes_read += len(chunk)
+            chunk = self._decoder.decode(chunk)
+        self._parser.feed(chunk)
+        if self.backend == "lxml":
+            self._drain_lxml_events()
+        self.parse_seconds += time.perf_counter() - start
+
+    def close(self):
+        start = time.perf_counter()
+        try:
+            return self._close()
+        finally:
+            self.parse_seconds += time.perf_counter() - start
+
+    def _close(self):
+        if self.truncated:
+            # Cut short mid-document: elements still open hold partial text
+            self.stack.clear()
+            self.nodes.clear()
+            self.capturing.clear()
+            return self
+        if self.backend == "lxml":
+            self._parser.feed(self._decoder.decode(b'', final=True))
+            self._parser.close()
+            self._drain_lxml_events()
+        else:
+            self._parser.feed(self._decoder.decode(b'', final=True))
+            self._parser.close()
+            while self.stack:
+                self._pop()
+        return self
+
+    def _drain_lxml_events(self):
+        for event, elem in self._parser.read_events():
+            if not isinstance(elem.tag, str):
+                continue
+            if event == 'start':
+                self.start(elem.tag, elem.attrib.items())
+            else:
+                frame = self.stack.pop()
+                self.nodes.pop()
+                if frame[3] is not None:
+                    self.capturing.remove(frame)
+                    self._finish(frame, ''.join(text.strip() for text in elem.itertext()))
+                # Nothing above still needs this subtree's text, so free it
+                if not self.capturing:
+                    elem.clear(keep_tail=True)
+
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        self._in_text = False
+        if self.backend != "lxml":
+            if tag in VOID_TAGS:
+                return
+            if tag in P_CLOSING_TAGS and any(frame[0] == 'p' for frame in self.stack):
+                self.end('p')
+        
+        attrs = dict((name, value or '') for name, value in attrs)
+        classes = frozenset(attrs.get('class', '').split())
+        node = (tag, attrs, classes)
+        ancestors = self.nodes
+        
+        if COMPILED_LINK_SELECTORS.match(node, ancestors):
+            href = attrs.get('href')
+            if href and href not in self._seen_links:
+                self._seen_links.add(href)
+                self.links.append(href)
+        
+        title_hits, content_hits, buffer = (), (), None
+        if self.want_article:
+            title_hits = [i for i in COMPILED_TITLE_SELECTORS.match(node, ancestors) if i not in self.title_matches]
+            content_hits = COMPILED_CONTENT_SELECTORS.match(node, ancestors)
+            if title_hits or content_hits:
+                buffer = []
+        
+        frame = (tag, title_hits, content_hits, buffer)
+        self.stack.append(frame)
+        self.nodes.append(node)
+        if buffer is not None:
+            self.capturing.append(frame)
+
+    def end(self, tag):
+        tag = tag.lower()
+        self._in_text = False
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.stack[depth][0] == tag:
+                while len(self.stack) > depth:
+                    self._pop()
+                return
+
+    def data(self, text):
+        if self.stack and self.stack[-1][0] in ('script', 'style'):
+            return
+        # html.parser flushes text at every chunk boundary; glue the pieces back
+        # into one text node so stripping them cannot depend on the chunk size
+        if self._in_text:
+            for frame in self.capturing:
+                frame[3][-1] += text
+        else:
+            for frame in self.capturing:
+                frame[3].append(text)
+        self._in_text = True
+
+    def _pop(self):
+        frame = self.stack.pop()
+        self.nodes.pop()
+        if frame[3] is not None:
+            self.capturing.remove(frame)
+            self._finish(frame, ''.join(text.strip() for text in frame[3]))
+
+    def _finish(self, frame, text):
+        for index in frame[1]:
+            self.title_matches.setdefault(index, text)
+        for index in frame[2]:
+            self.content_matches[index].append(text)
+
+    @property
+    def title(self):
+        """Text of the first element matching the highest-priority title selector"""
+        for index in range(len(TITLE_SELECTORS)):
+            if index in self.title_matches:
+                return self.title_matches[index]
+        return ""
+
+    @property
+    def satisfied(self):
+        """True once a title and content_budget characters of content are in hand
+        
+        Paragraphs are chosen the same way as content_parts(); a selector whose
+        element is still open could outrank them, so that has to close first.
+        """
+        if not self.content_budget or not self.title_matches:
+            return False
+        parts, last_index = self._select_content(self.min_paragraphs)
+        if sum(len(text) + 1 for text in parts) <= self.content_budget:
+            return False
+        return not any(hit <= last_index for frame in self.capturing for hit in frame[2])
+
+    def _select_content(self, min_paragraphs):
+        parts = []
+        seen = set()
+        index = -1
+        for index, texts in enumerate(self.content_matches):
+            for text in texts:
+                if len(text) > 20 and text not in seen:
+                    seen.add(text)
+                    parts.append(text)
+            
+            if len(parts) >= min_paragraphs:  # Get at least 5 paragraphs
+                break
+        return parts, index
+
+    def content_parts(self, min_paragraphs=5):
+        """Unique paragraphs from the content selectors, in priority order"""
+        return self._select_content(min_paragraphs)[0]
+
+
+class ExtractedPage:
+    """A closed extractor's results without its parser state
+
+    This is all a parse worker process sends back: title, paragraphs and links
+    rather than the page, so the pickled reply stays a few KB.
+    """
+
+    __slots__ = ('title', 'parts', 'links', 'bytes_read', 'parse_seconds', 'truncated')
+
+    def __init__(self, extractor):
+        self.title = extractor.title
+        self.parts = extractor.content_parts() if extractor.want_article else []
+        self.links = extractor.links
+        self.bytes_read = extractor.bytes_read
+        self.parse_seconds = extractor.parse_seconds
+        self.truncated = extractor.truncated
+
+    def content_parts(self, min_paragraphs=5):
+        return self.parts
+
+
+def extract_page(body, backend="html.parser", want_article=True, content_budget=None):
+    """Parse one downloaded page into an ExtractedPage
+    
+    Module-level so a ProcessPoolExecutor can run it; with content_budget the
+    parse stops once a title and that much content are found.
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    extractor = SinglePassExtractor(backend, want_article=want_article, content_budget=content_budget)
+    if content_budget:
+        stream_into(extractor, iter_chunks(body))
+    else:
+        extractor.feed(body)
+        extractor.close()
+    return ExtractedPage(extractor)
+
+
+# First prefix size a PooledArticleSink has parsed; each later parse doubles it
+POOLED_PARSE_STEP = 2 * STREAM_CHUNK_SIZE
+
+
+class PooledArticleSink:
+    """Streaming sink for article downloads that parses on a parse worker process
+    
+    A worker cannot keep parser state between jobs, so the sink buffers the
+    download and has a worker parse the prefix each time it doubles in size.
+    Once a prefix holds a title and content_budget chars of content the
+    download can stop, as with an in-process extractor; the doubling keeps the
+    parsing to at most twice the bytes read. close() leaves the result (an
+    ExtractedPage) in page.
+    """
+
+    def __init__(self, pool, backend="html.parser", content_budget=None, first_parse=POOLED_PARSE_STEP):
+        self.pool = pool
+        self.backend = backend
+        self.content_budget = content_budget
+        self.chunks = []
+        self.bytes_read = 0
+        self.parse_seconds = 0.0
+        self.truncated = False
+        self.page = None
+        self._next_parse = first_parse
+
+    def feed(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        self.chunks.append(chunk)
+        self.bytes_read += len(chunk)
+        if self.content_budget and self.bytes_read >= self._next_parse:
+            self._next_parse = 2 * self.bytes_read
+            page = self._parse()
+            if page.truncated:
+                self.page = page  # The budget was reached inside this prefix
+
+    @property
+    def satisfied(self):
+        return self.page is not None
+
+    def close(self):
+        if self.page is None:
+            self.page = self._parse()
+        # A last parse that hit the budget reads as cut short too, as the
+        # in-process extractor would have been (e.g. a cached prefix fed whole)
+        self.truncated = self.truncated or self.page.truncated
+        self.page.bytes_read = self.bytes_read
+        self.page.parse_seconds = self.parse_seconds
+        self.chunks = []
+        return self
+
+    def _parse(self):
+        page = self.pool.submit(extract_page, b''.join(self.chunks), self.backend, True, self.content_budget).result()
+        self.parse_seconds += page.parse_seconds
+        return page
+
+
 class ImprovedBBCCrawler:
-    def _init_(self, model_name="llama3.2:latest"):
+    def __init__(self, model_name="llama3.2:latest", fetch_backend="async",
+               max_concurrency=64, max_per_host=8, request_timeout=20,
+               http_cache_dir=".crawler_cache/http", http_cache_max_mb=200,
+               http_cache_max_age_hours=168, index_path=".crawler_cache/articles.db",
+               recheck_hours=6, parser_backend="html.parser", pipeline=True,
+               pipeline_workers=None, queue_size=32, batch_analysis=False,
+               max_batch_size=8, batch_context=8192,
+               analysis_cache_path=".crawler_cache/analysis.db", analysis_cache_size=1024,
+               analysis_cache_ttl_hours=72, rate_limit=5.0, rate_burst=10,
+               max_host_concurrency=16, max_retries=3, near_duplicate_distance=6,
+               near_duplicate_shingle=3, url_patterns=None, stream_extraction=True,
+               content_budget=3000, stream_analysis=True, structured_output=True,
+               ollama_hosts=None, ollama_max_concurrency=2, ollama_keep_alive="30m",
+               warm_up=True, fetch_origin=None, tracing=False, metrics_path=None,
+               parse_workers=0, max_depth=1, category_quota=None, category_weights=None,
+               frontier_size=200000):
         self.base_url = "https://www.bbc.com"
-        self.session = requests.Session()
+        self.url_classifier = URLClassifier(self.base_url)
+        self._session = None
         self.lock = threading.Lock()
         self.model_name = model_name
         
-        # Initialize Ollama client
-        self.ollama_client = ollama.Client()
+        # Per-stage metrics (fetch, parse, classify, analyze, save), exported to
+        # metrics_path after each crawl: Prometheus text for .prom, else JSON.
+        # tracing=True also keeps one span per stage per article.
+        self.metrics = CrawlMetrics(tracing=tracing)
+        self.metrics_path = metrics_path
         
-        # Test Ollama connection
-        try:
-            response = self.ollama_client.chat(model=self.model_name, messages=[
-                {'role': 'user', 'content': 'Hello, are you working?'}
-            ])
-            print(f" Ollama connection successful with model: {self.model_name}")
-        except Exception as e:
-            print(f"Ollama connection failed: {e}")
-            print(f"Make sure Ollama is running and the model is installed: ollama run {self.model_name}")
+        # Fetch backend: "async" (aiohttp) or "threads" (requests + ThreadPoolExecutor)
+        self.fetch_backend = fetch_backend
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.request_timeout = request_timeout
+        # Send every request to this origin instead, keeping the article URLs
+        # (used by benchmarks/bench_crawl.py to replay recorded pages)
+        self.fetch_origin = fetch_origin
+        if self.fetch_backend == "async" and not HAVE_AIOHTTP:
+            print(" aiohttp not installed, falling back to thread-based fetching")
+            self.fetch_backend = "threads"
+        
+        # HTML parser backend for the single-pass extractor: "html.parser" or "lxml"
+        self.parser_backend = parser_backend
+        if self.parser_backend == "lxml" and lxml_etree is None:
+            print(" lxml not installed, falling back to html.parser")
+            self.parser_backend = "html.parser"
+        
+        # Streamed extraction: article bodies are fed to the parser chunk by chunk
+        # and the download stops once a title and content_budget chars are found
+        self.stream_extraction = stream_extraction
+        self.content_budget = content_budget
+        self.stream_stats = {'pages': 0, 'cut_short': 0, 'bytes_read': 0}
+        
+        # Parse worker processes (parse_workers=None means one per core; 0 parses
+        # in the fetching threads). Fetching stays on threads/asyncio and the
+        # workers get the downloaded bytes; with stream_extraction they parse
+        # growing prefixes (PooledArticleSink) so downloads still stop at
+        # content_budget. close() (or leaving a with block) shuts them down.
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self._parse_pool = None
+        
+        # Streaming pipeline: per-stage worker threads joined by bounded queues.
+        # With pipeline=False categories are crawled one at a time using fetch_backend.
+        self.pipeline = pipeline
+        self.pipeline_workers = {'discover': 4, 'extract': 3, 'analyze': 2}
+        if self.parse_workers:
+            # Extract threads wait on the pool while parsing, so keep enough
+            # of them downloading to keep every worker process busy
+            self.pipeline_workers['extract'] = max(3, 2 * self.parse_workers)
+        self.pipeline_workers.update(pipeline_workers or {})
+        self.queue_size = queue_size
+        
+        # Crawl frontier (pipeline mode): seed-page links and, with max_depth > 1,
+        # links found inside extracted articles are queued by score (category
+        # weight, link position, depth). category_quota caps articles per category
+        # per crawl (an int, or {category: n}); None means max_per_category per
+        # seed page. At most frontier_size URLs are queued at once.
+        self.max_depth = max_depth
+        self.category_quota = category_quota
+        self.category_weights = category_weights or {}
+        self.frontier_size = frontier_size
+        self.frontier = None
+        
+        # Batched analysis: several articles per Ollama request. The batch size is
+        # derived from the model's context window, capped at max_batch_size.
+        self.batch_analysis = batch_analysis
+        self.max_batch_size = max_batch_size
+        self.batch_context = batch_context
+        self._batch_size = None
+        self._context_length = None
+        
+        # Analysis replies are streamed and cut off once the JSON closes; the
+        # structured-output schema keeps the model from adding any chatter
+        self.stream_analysis = stream_analysis
+        self.structured_output = structured_output
+        
+        # Analysis memo keyed on model, prompt version and content (None disables it)
+        self.analysis_cache = None
+        if analysis_cache_path:
+            self.analysis_cache = AnalysisCache(
+                analysis_cache_path,
+                max_entries=analysis_cache_size,
+                ttl=analysis_cache_ttl_hours * 3600
+            )
+        
+        # Near-duplicate grouping before analysis (near_duplicate_distance=None disables it):
+        # SimHash Hamming distance <= near_duplicate_distance counts as the same story
+        self.near_duplicate_distance = near_duplicate_distance
+        self.near_duplicate_shingle = near_duplicate_shingle
+        self.reset_near_duplicates()
+        
+        # Persistent conditional-GET cache (set http_cache_dir=None to disable)
+        self.http_cache = None
+        if http_cache_dir:
+            self.http_cache = HTTPCache(
+                http_cache_dir,
+                max_bytes=http_cache_max_mb * 1024 * 1024,
+                max_age=http_cache_max_age_hours * 3600
+            )
+        
+        # Seen-article index for incremental crawls (set index_path=None to disable).
+        # Articles checked less than recheck_hours ago are reused without a fetch.
+        self.article_index = ArticleIndex(index_path) if index_path else None
+        self.recheck_hours = recheck_hours
+        
+        # Ollama endpoint pool (least-outstanding-requests, with health checks).
+        # ollama_hosts is a list of URLs or {url: max_concurrency}; None uses OLLAMA_HOST.
+        self.ollama_client = OllamaPool(ollama_hosts, max_concurrency=ollama_max_concurrency)
+        if 'analyze' not in (pipeline_workers or {}):
+            self.pipeline_workers['analyze'] = max(2, self.ollama_client.capacity)
+        
+        # No inference at startup: each crawl checks the model and preloads it
+        # in the background (warm_up) while discovery is already fetching
+        self.ollama_keep_alive = ollama_keep_alive
+        self.warm_up = warm_up
+        self._warm_up_thread = None
         
         # Enhanced headers to appear more like a real browser
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,/;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
@@ -44,9 +2856,11 @@ class ImprovedBBCCrawler:
             'Sec-Fetch-Mode': 'navigate',
             'Sec-Fetch-Site': 'none',
             'Cache-Control': 'max-age=0'
-        })
+        }
         
-        # BBC URL patterns for better article discovery
+        # BBC URL patterns for better article discovery. A category may also be
+        # {'source': 'rss' | 'sitemap', 'urls': [...], 'max_age_hours': 24}
+        # to discover from feeds instead of full HTML category pages.
         self.url_patterns = {
             'news': [
                 'https://www.bbc.com/news',
@@ -67,53 +2881,215 @@ class ImprovedBBCCrawler:
                 'https://www.bbc.com/travel'
             ]
         }
+        if url_patterns is not None:
+            self.url_patterns = url_patterns
         
-    def discover_article_urls(self, base_urls, max_per_category=5):
-        """Discover actual article URLs from category pages - PARALLELIZED"""
-        def fetch_single_category(url):
+        # Per-host token bucket + AIMD concurrency, and retries with a budget
+        self.rate_limiter = HostRateLimiter(
+            rate=rate_limit,
+            burst=rate_burst,
+            max_concurrency=max_host_concurrency,
+            initial_concurrency=min(4, max_host_concurrency)
+        )
+        self.retry_policy = RetryPolicy(max_retries=max_retries)
+        self.failed_urls = {}
+        
+        self.fetch_engine = None
+        if self.fetch_backend == "async":
+            self.fetch_engine = AsyncFetchEngine(
+                self.headers,
+                max_concurrency=self.max_concurrency,
+                max_per_host=self.max_per_host,
+                timeout=self.request_timeout,
+                cache=self.http_cache,
+                rate_limiter=self.rate_limiter,
+                retry_policy=self.retry_policy,
+                on_failure=self.record_failure,
+                origin=self.fetch_origin,
+                metrics=self.metrics
+            )
+        
+    def close(self):
+        """Stop the async fetch engine's loop thread and the parse worker processes"""
+        if self.fetch_engine:
+            self.fetch_engine.close()
+        with self.lock:
+            pool, self._parse_pool = self._parse_pool, None
+        if pool is not None:
+            pool.shutdown()
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *exc_info):
+        self.close()
+        
+    @property
+    def session(self):
+        """Shared requests session, created (and requests imported) on first use"""
+        if self._session is None:
+            with self.lock:
+                if self._session is None:
+                    import requests
+                    session = requests.Session()
+                    session.headers.update(self.headers)
+                    self._session = session
+        return self._session
+    
+    def collect_metrics(self):
+        """Copy cache, retry and Ollama endpoint totals into the metrics registry"""
+        for name, cache in (('http', self.http_cache), ('analysis', self.analysis_cache)):
+            if cache:
+                self.metrics.set_counter('cache_hits_total', cache.hits, cache=name)
+                self.metrics.set_counter('cache_misses_total', cache.misses, cache=name)
+        
+        retries = self.retry_policy.snapshot()
+        self.metrics.set_counter('http_requests_total', retries['requests'])
+        self.metrics.set_counter('http_retries_total', retries['retries'])
+        for host, endpoint in self.ollama_client.snapshot().items():
+            self.metrics.set_counter('ollama_requests_total', endpoint['requests'], endpoint=host)
+            self.metrics.set_gauge('ollama_in_flight', endpoint['in_flight'], endpoint=host)
+    
+    def export_metrics(self, path):
+        """Write metrics to path: Prometheus text for .prom/.txt, JSON (with spans) otherwise"""
+        self.collect_metrics()
+        if path.endswith(('.prom', '.txt')):
+            text = self.metrics.prometheus()
+        else:
+            text = json.dumps(self.metrics.snapshot(include_spans=True), indent=2)
+        
+        tmp_path = path + '.part'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        print(f" Metrics written to {path}")
+    
+    def warm_up_ollama(self):
+        """Readiness check and model preload on every Ollama endpoint"""
+        start = time.time()
+        for host, error in self.ollama_client.warm_up(self.model_name, self.ollama_keep_alive).items():
+            if error is None:
+                print(f" Ollama ready on {host} with model {self.model_name} ({time.time() - start:.1f}s)")
+            else:
+                print(f"Ollama not ready on {host}: {error}")
+                print(f"Make sure Ollama is running and the model is installed: ollama run {self.model_name}")
+    
+    def start_warm_up(self):
+        """Run warm_up_ollama in the background unless it is already running"""
+        if self._warm_up_thread is None or not self._warm_up_thread.is_alive():
+            self._warm_up_thread = threading.Thread(target=self.warm_up_ollama, daemon=True)
+            self._warm_up_thread.start()
+    
+    def fetch_page(self, url, timeout=None, sink_factory=None):
+        """Fetch a page with the shared requests session (thread-based backend)
+        
+        Goes through the per-host rate limiter and retries 429/5xx and network
+        errors with backoff; URLs that still fail are recorded in failed_urls.
+        With sink_factory the body is streamed into the returned sink instead.
+        """
+        host = urlsplit(url).netloc
+        attempt = 0
+        
+        while True:
+            self.rate_limiter.acquire(host)
+            self.retry_policy.record_request()
+            
+            start = time.perf_counter()
             try:
-                print(f"🔍 Discovering articles from: {url}")
-                response = self.session.get(url, timeout=15)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Enhanced selectors for BBC article links
-                link_selectors = [
-                    'a[href*="/news/"]',
-                    'a[href*="/sport/"]',
-                    'a[href*="/culture/"]',
-                    'a[data-testid="internal-link"]',
-                    '.gs-c-promo-heading a',
-                    '.media__link',
-                    '[class*="promo"] a[href]',
-                    '.story-link',
-                    'h2 a[href], h3 a[href]'
-                ]
-                
-                found_links = set()
+                body = self._fetch_page_once(url, timeout or self.request_timeout, sink_factory)
+                self.rate_limiter.release(host, 200)
+                record_fetch(self.metrics, url, body, time.perf_counter() - start)
+                return body
+            except Exception as e:
+                record_fetch(self.metrics, url, None, time.perf_counter() - start, e)
+                status, retry_after = failure_details(e)
+                self.rate_limiter.release(host, status, retry_after, error=status is None)
                 
-                for selector in link_selectors:
-                    links = soup.select(selector)
-                    for link in links:
-                        href = link.get('href')
-                        if href:
-                            full_url = urljoin(url, href)
-                            
-                            if self.is_valid_article_url(full_url):
-                                found_links.add(full_url)
+                delay = self.retry_policy.retry_delay(attempt, status, retry_after)
+                if delay is None:
+                    self.record_failure(url, e)
+                    raise
                 
-                category_articles = list(found_links)[:max_per_category]
-                print(f" Found {len(category_articles)} articles from {url}")
-                return category_articles
+                attempt += 1
+                print(f" Retrying {url} in {delay:.1f}s (attempt {attempt}, {status or type(e).__name__})")
+                time.sleep(delay)
+    
+    def fetch_url(self, url, timeout=None, sink_factory=None):
+        """Fetch one page with the configured fetch_backend, raising if it could not be fetched"""
+        if not self.fetch_engine:
+            return self.fetch_page(url, timeout=timeout, sink_factory=sink_factory)
+        body = self.fetch_engine.fetch_url(url, timeout, sink_factory)
+        if body is None:
+            # The engine has already retried and recorded the failure
+            raise IOError(f"Could not fetch {url}: {self.failed_urls.get(url, 'unknown error')}")
+        return body
+    
+    def _fetch_page_once(self, url, timeout, sink_factory=None):
+        stream = sink_factory is not None
+        headers = self.http_cache.conditional_headers(url, partial_ok=stream) if self.http_cache else {}
+        target = with_origin(url, self.fetch_origin)
+        response = self.session.get(target, timeout=timeout, headers=headers, stream=stream)
+        
+        if response.status_code == 304 and self.http_cache:
+            response.close()
+            cached = self.http_cache.replay(url, sink_factory)
+            if cached is not None:
+                return cached
+            # Cached body unusable - fall back to a full download
+            response.close()
+            response = self.session.get(target, timeout=timeout, stream=stream)
+        
+        if not stream:
+            response.raise_for_status()
+            if self.http_cache:
+                self.http_cache.store(url, response.content, response.headers)
+            return response.content
+        
+        # Closing a streamed response mid-body drops the connection instead of
+        # draining it, so the rest of a long page is never read
+        with response:
+            response.raise_for_status()
+            sink = sink_factory()
+            body = stream_into(sink, response.iter_content(STREAM_CHUNK_SIZE),
+                               keep_body=self.http_cache is not None)
+        if body is not None:
+            # A cut-short prefix is cached too, so the next fetch can be conditional
+            self.http_cache.store(url, body, response.headers, complete=not sink.truncated)
+        return sink
+    
+    def record_failure(self, url, error):
+        """Remember a URL that could not be fetched so it is reported, not silently dropped"""
+        with self.lock:
+            self.failed_urls[url] = repr(error)
+    
+    def discover_article_urls(self, base_urls, max_per_category=5, source='html', max_age_hours=None):
+        """Discover actual article URLs from category pages or feeds - PARALLELIZED"""
+        def fetch_single_category(url):
+            try:
+                print(f"🔍 Discovering articles from: {url}")
+                html = self.fetch_page(url, timeout=15)
+                return self.discover_links(url, html, max_per_category, source, max_age_hours)
                 
             except Exception as e:
                 print(f" Error discovering articles from {url}: {e}")
                 return []
         
-        # PARALLELIZED URL DISCOVERY
         all_articles = []
-        with ThreadPoolExecutor(max_workers=4) as executor:
+        
+        # ASYNC URL DISCOVERY - every category page in flight at once
+        if self.fetch_backend == "async":
+            for url, html in self.fetch_engine.fetch_all(base_urls, timeout=15):
+                if html is None:
+                    continue
+                try:
+                    all_articles.extend(self.discover_links(url, html, max_per_category, source, max_age_hours))
+                except Exception as e:
+                    print(f" Error discovering articles from {url}: {e}")
+            
+            return list(set(all_articles))
+        
+        # PARALLELIZED URL DISCOVERY
+        with ThreadPoolExecutor(max_workers=self.pipeline_workers['discover']) as executor:
             future_to_url = {executor.submit(fetch_single_category, url): url for url in base_urls}
             
             for future in as_completed(future_to_url):
@@ -125,105 +3101,162 @@ class ImprovedBBCCrawler:
         
         return list(set(all_articles))
     
-    def is_valid_article_url(self, url):
-        """Check if URL is a valid BBC article"""
-        if not url or not url.startswith('https://www.bbc.com'):
-            return False
+    def parse_pool(self):
+        """Process pool for parsing, created on first use (None with parse_workers=0)"""
+        if not self.parse_workers:
+            return None
+        if self._parse_pool is None:
+            with self.lock:
+                if getattr(sys.modules.get(__name__), 'extract_page', None) is not extract_page:
+                    # Jobs name extract_page by module, so a loader must register
+                    # this module in sys.modules before exec_module
+                    print(f" Module {__name__} is not in sys.modules, parsing in-process")
+                    self.parse_workers = 0
+                    return None
+                if self._parse_pool is None:
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+                    # fork: workers inherit this module even when it was loaded
+                    # from a path ("crawler code.py" is not importable by name)
+                    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+                    self._parse_pool = ProcessPoolExecutor(
+                        max_workers=self.parse_workers,
+                        mp_context=multiprocessing.get_context(method)
+                    )
+        return self._parse_pool
+    
+    def start_parse_pool(self):
+        """Start the parse workers now, before the crawl starts its own threads"""
+        pool = self.parse_pool()
+        if pool is not None:
+            pool.submit(int).result()
+    
+    def parse_page(self, body, want_article=True, content_budget=None):
+        """Run extract_page on a parse worker, or inline with parse_workers=0"""
+        pool = self.parse_pool()
+        if pool is None:
+            return extract_page(body, self.parser_backend, want_article, content_budget)
+        return pool.submit(extract_page, body, self.parser_backend, want_article, content_budget).result()
+    
+    def parse_category_links(self, url, html, max_per_category=5):
+        """Pull article links out of a downloaded category page"""
+        extractor = self.parse_page(html, want_article=False)
+        self.metrics.record_span('parse', extractor.parse_seconds, url, bytes=extractor.bytes_read)
+        
+        # Keep page order so the first links are the most prominent ones
+        with self.metrics.span('classify', url, links=len(extractor.links)):
+            found_links = []
+            seen = set()
+            for href in extractor.links:
+                classified = self.url_classifier.classify(urljoin(url, href))
+                
+                if classified and classified[0] not in seen:
+                    seen.add(classified[0])
+                    found_links.append(classified[0])
         
-        exclude_patterns = [
-            '/live/', '/topics/', '/programmes/', '/sounds/',
-            '/weather/', '/search/', '/contact/', '/about/',
-            '/accessibility/', '/privacy/', '/cookies/',
-            '/player/', '/iplayer/', '/sounds/', '/contact',
-            '.json', '.xml', '.css', '.js', '.png', '.jpg',
-            '#', '?', 'mailto:', 'tel:'
-        ]
+        category_articles = found_links[:max_per_category]
+        print(f" Found {len(category_articles)} articles from {url}")
+        return category_articles
+    
+    def parse_feed_links(self, url, body, max_per_category=5, max_age_hours=None):
+        """Pull article links out of an RSS/Atom feed or news sitemap"""
+        cutoff = None
+        if max_age_hours:
+            cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
         
-        for pattern in exclude_patterns:
-            if pattern in url.lower():
-                return False
+        # Feeds list newest first, so stop streaming once the quota is filled
+        found_links = []
+        seen = set()
+        skipped = 0
+        classify_seconds = 0.0
+        start = time.perf_counter()
+        for link, published in iter_feed_entries(body):
+            if not link:
+                continue
+            if cutoff and published and published < cutoff:
+                skipped += 1
+                continue
+            
+            classify_start = time.perf_counter()
+            classified = self.url_classifier.classify(urljoin(url, link))
+            classify_seconds += time.perf_counter() - classify_start
+            if classified and classified[0] not in seen:
+                seen.add(classified[0])
+                found_links.append(classified[0])
+                if max_per_category and len(found_links) >= max_per_category:
+                    break
         
-        valid_patterns = [
-            '/news/', '/sport/', '/culture/', '/travel/',
-            '/future/', '/worklife/'
-        ]
+        self.metrics.record_span('parse', time.perf_counter() - start - classify_seconds, url, bytes=len(body))
+        self.metrics.record_span('classify', classify_seconds, url)
         
-        return any(pattern in url for pattern in valid_patterns)
+        print(f" Found {len(found_links)} articles from feed {url} ({skipped} too old)")
+        return found_links
+    
+    def category_sources(self, spec):
+        """Normalize a url_patterns entry to (source, urls, max_age_hours)"""
+        if isinstance(spec, dict):
+            source = spec.get('source', 'html')
+            if source not in DISCOVERY_SOURCES:
+                raise ValueError(f"Unknown discovery source: {source}")
+            return source, list(spec.get('urls', [])), spec.get('max_age_hours')
+        return 'html', list(spec), None
+    
+    def discover_links(self, url, body, max_per_category=5, source='html', max_age_hours=None):
+        """Parse a discovery page with the backend its category asks for"""
+        if source == 'html':
+            return self.parse_category_links(url, body, max_per_category)
+        return self.parse_feed_links(url, body, max_per_category, max_age_hours)
+    
+    def is_valid_article_url(self, url):
+        """Check if URL is a valid BBC article"""
+        return self.url_classifier.is_valid(url)
     
     def extract_content_direct(self, urls):
-        """Direct content extraction using requests and BeautifulSoup"""
+        """Direct content extraction with the single-pass extractor"""
         print(f"🚀 Processing {len(urls)} URLs with direct extraction...")
         
         def extract_single_article(url):
             try:
                 print(f" Processing: {url}")
-                response = self.session.get(url, timeout=20)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Extract title
-                title_selectors = [
-                    'h1[data-testid="headline"]',
-                    'h1.story-body__h1',
-                    'h1',
-                    '.story-headline h1',
-                    '[data-testid="headline"]'
-                ]
-                
-                title = ""
-                for selector in title_selectors:
-                    title_elem = soup.select_one(selector)
-                    if title_elem:
-                        title = title_elem.get_text(strip=True)
-                        break
-                
-                # Extract content
-                content_selectors = [
-                    '[data-component="text-block"]',
-                    '.story-body__inner p',
-                    '.ssrcss-uf6wea-RichTextComponentWrapper p',
-                    'div[data-component="text-block"] p',
-                    '.gel-body-copy p',
-                    'p'
-                ]
-                
-                content_parts = []
-                for selector in content_selectors:
-                    elements = soup.select(selector)
-                    for elem in elements:
-                        text = elem.get_text(strip=True)
-                        if len(text) > 20 and text not in content_parts:
-                            content_parts.append(text)
-                    
-                    if len(content_parts) >= 5:  # Get at least 5 paragraphs
-                        break
-                
-                content = ' '.join(content_parts)
-                
-                if len(content) < 100:
-                    print(f" Content too short for: {url}")
-                    return None
-                
-                article = {
-                    'url': url,
-                    'title': title or "No title found",
-                    'content': content[:3000],
-                    'extracted_at': datetime.now().isoformat(),
-                    'word_count': len(content.split()),
-                    'category': self.categorize_url(url)
-                }
-                
-                print(f" Extracted: {title[:50]}... ({len(content)} chars)")
-                return article
+                return self.fetch_article(url, timeout=20)
                 
             except Exception as e:
                 print(f" Error extracting {url}: {e}")
                 return None
         
-        # Process articles with some parallelization but not too aggressive
         articles = []
-        with ThreadPoolExecutor(max_workers=3) as executor:
+        
+        # Async backend: fetch everything concurrently, then parse the bodies
+        if self.fetch_backend == "async":
+            sink_factory = self.article_sink_factory()
+            pool = self.parse_pool() if sink_factory is None else None
+            fetched = self.fetch_engine.fetch_all(urls, timeout=20, sink_factory=sink_factory)
+            if pool is not None:
+                # Every body goes to the parse workers at once; results keep URL order
+                fetched = [
+                    (url, body if body is None else pool.submit(
+                        extract_page, body, self.parser_backend, True, self.article_budget()))
+                    for url, body in fetched
+                ]
+            
+            for url, body in fetched:
+                if body is None:
+                    continue
+                try:
+                    if pool is not None:
+                        article = self.article_from_extractor(url, body.result())
+                    else:
+                        article = self.article_from_body(url, body)
+                    if article:
+                        articles.append(article)
+                except Exception as e:
+                    print(f" Error extracting {url}: {e}")
+            
+            print(f" Successfully extracted {len(articles)} articles")
+            return articles
+        
+        # Process articles with some parallelization but not too aggressive
+        with ThreadPoolExecutor(max_workers=self.pipeline_workers['extract']) as executor:
             future_to_url = {executor.submit(extract_single_article, url): url for url in urls}
             
             for future in as_completed(future_to_url):
@@ -237,200 +3270,748 @@ class ImprovedBBCCrawler:
         print(f" Successfully extracted {len(articles)} articles")
         return articles
     
+    def article_budget(self):
+        """Content budget for article parsing (None when stream_extraction is off)"""
+        return self.content_budget if self.stream_extraction else None
+    
+    def new_article_extractor(self):
+        """Extractor for one article page, stopping at the content budget when streaming"""
+        return SinglePassExtractor(self.parser_backend, content_budget=self.article_budget())
+    
+    def new_pooled_extractor(self):
+        """Streaming sink for one article page that parses on the parse workers"""
+        return PooledArticleSink(self.parse_pool(), self.parser_backend, content_budget=self.article_budget())
+    
+    def article_sink_factory(self):
+        """sink_factory for article downloads: an extractor when streaming, else None for raw bytes"""
+        if not self.stream_extraction:
+            return None
+        if self.parse_pool() is not None:
+            return self.new_pooled_extractor
+        return self.new_article_extractor
+    
+    def fetch_article(self, url, timeout=20, on_links=None):
+        """Download and parse one article, streaming the body when stream_extraction is on"""
+        body = self.fetch_url(url, timeout=timeout, sink_factory=self.article_sink_factory())
+        return self.article_from_body(url, body, on_links)
+    
+    def article_from_body(self, url, body, on_links=None):
+        """Article from what a fetch returned: a streamed extractor or the raw page"""
+        if isinstance(body, (bytes, str)):
+            return self.parse_article(url, body, on_links)
+        if isinstance(body, PooledArticleSink):
+            body = body.page
+        return self.article_from_extractor(url, body, on_links)
+    
+    def parse_article(self, url, html, on_links=None):
+        """Extract title and body text from a downloaded article page"""
+        return self.article_from_extractor(url, self.parse_page(html, content_budget=self.article_budget()), on_links)
+    
+    def article_from_extractor(self, url, extractor, on_links=None):
+        """Build the article record from a closed extractor
+        
+        on_links, if given, gets the links found on the page (only those before
+        the cut-off when the download stopped at the content budget).
+        """
+        with self.lock:
+            self.stream_stats['pages'] += 1
+            self.stream_stats['bytes_read'] += extractor.bytes_read
+            self.stream_stats['cut_short'] += extractor.truncated
+        self.metrics.record_span('parse', extractor.parse_seconds, url,
+                                 bytes=extractor.bytes_read, truncated=extractor.truncated)
+        
+        title = extractor.title
+        content_parts = extractor.content_parts()
+        
+        content = ' '.join(content_parts)
+        
+        if len(content) < 100:
+            print(f" Content too short for: {url}")
+            return None
+        
+        if on_links:
+            on_links(extractor.links)
+        
+        article = Article(
+            url=url,
+            title=title or "No title found",
+            content=content[:self.content_budget],
+            extracted_at=datetime.now().isoformat(),
+            word_count=len(content.split()),
+            category=self.categorize_url(url)
+        )
+        
+        print(f" Extracted: {title[:50]}... ({len(content)} chars)")
+        return article
+    
     def categorize_url(self, url):
         """Categorize URL based on path"""
-        if not url:
-            return 'unknown'
+        return self.url_classifier.categorize(url)
+    
+    def ollama_json(self, prompt, options, schema=None):
+        """Run one chat request and return the text of its JSON answer
         
-        if '/news/' in url:
-            if '/world/' in url:
-                return 'world'
-            elif '/uk/' in url:
-                return 'uk'
-            elif '/business/' in url:
-                return 'business'
-            elif '/politics/' in url:
-                return 'politics'
-            elif '/health/' in url:
-                return 'health'
-            elif '/technology/' in url:
-                return 'technology'
-            elif '/science/' in url:
-                return 'science'
-            else:
-                return 'news'
-        elif '/sport/' in url:
-            return 'sport'
-        elif '/culture/' in url:
-            return 'culture'
-        elif '/travel/' in url:
-            return 'travel'
-        elif '/future/' in url:
-            return 'future'
-        else:
-            return 'general'
+        With structured_output the schema is sent as Ollama's `format`. With
+        stream_analysis the reply is streamed through a JSONStreamScanner and
+        the stream is closed as soon as the top-level value is complete, which
+        drops the connection and stops generation.
+        """
+        request = {
+            'model': self.model_name,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'options': options,
+            'keep_alive': self.ollama_keep_alive
+        }
+        if self.structured_output and schema:
+            request['format'] = schema
+        
+        start = time.perf_counter()
+        if not self.stream_analysis:
+            response = self.ollama_client.chat(**request)
+            self.metrics.observe('ollama_request_seconds', time.perf_counter() - start)
+            if response.get('eval_count') and response.get('eval_duration'):
+                self.metrics.inc('ollama_tokens_total', response['eval_count'])
+                self.metrics.inc('ollama_generation_seconds_total', response['eval_duration'] / 1e9)
+            return response['message']['content'].strip()
+        
+        # An object schema means the answer starts at '{', whatever brackets
+        # the model writes before it
+        scanner = JSONStreamScanner({'object': '{', 'array': '['}.get((schema or {}).get('type'), '{['))
+        tokens = 0
+        first_token = None
+        stream = self.ollama_client.chat(stream=True, **request)
+        try:
+            for chunk in stream:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    self.metrics.observe('ollama_ttft_seconds', first_token - start)
+                if chunk['message']['content']:
+                    tokens += 1
+                if scanner.feed(chunk['message']['content']):
+                    break
+        finally:
+            stream.close()
+            end = time.perf_counter()
+            self.metrics.observe('ollama_request_seconds', end - start)
+            if first_token is not None:
+                # One streamed chunk per generated token
+                self.metrics.inc('ollama_tokens_total', tokens)
+                self.metrics.inc('ollama_generation_seconds_total', end - first_token)
+        
+        return scanner.value or scanner.text.strip()
     
     def analyze_with_ollama_fast(self, content, category):
-        """OPTIMIZED Ollama analysis"""
-        prompt = f"""Analyze this {category} article briefly. Return only JSON:
-
-Content: {content[:800]}...
-
-{{"headline":"Main headline","summary":"Brief summary","key_topics":["topic1","topic2"],"sentiment":"positive/negative/neutral","urgency":"high/medium/low"}}"""
+        """OPTIMIZED Ollama analysis (memoized by content)"""
+        cache_key = None
+        if self.analysis_cache:
+            cache_key = self.analysis_cache.key(self.model_name, category, content)
+            cached = self.analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        prompt = ANALYSIS_PROMPT.format(category=category, content=content[:800])
         
         try:
-            response = self.ollama_client.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}],
+            response_text = self.ollama_json(
+                prompt,
                 options={
                     'temperature': 0.1, 
                     'num_predict': 150,
                     'top_k': 10,
                     'top_p': 0.9
-                }
+                },
+                schema=ANALYSIS_SCHEMA
             )
-            
-            response_text = response['message']['content'].strip()
+            analysis = None
             
             # Quick JSON extraction
             if response_text.startswith('{'):
                 try:
-                    return json.loads(response_text)
+                    analysis = json.loads(response_text)
                 except:
                     pass
             
             # Fallback JSON extraction
-            json_match = re.search(r'\{[^}]*\}', response_text)
-            if json_match:
-                try:
-                    return json.loads(json_match.group())
-                except:
-                    pass
+            if analysis is None:
+                json_match = re.search(r'\{[^}]*\}', response_text)
+                if json_match:
+                    try:
+                        analysis = json.loads(json_match.group())
+                    except:
+                        pass
+            
+            if isinstance(analysis, dict):
+                if self.analysis_cache:
+                    self.analysis_cache.put(cache_key, analysis)
+                return analysis
             
         except Exception as e:
+            self.metrics.record_error('analyze', e)
             print(f" Analysis failed for {category}: {e}")
             
         # Fast fallback
-        return {
-            "headline": "Analysis failed",
-            "summary": "Could not analyze content",
-            "key_topics": [],
-            "sentiment": "neutral",
-            "urgency": "medium"
-        }
+        return dict(FALLBACK_ANALYSIS)
+    
+    def context_length(self):
+        """Context window to use for batched requests (model limit, capped by batch_context)
+        
+        Read from /api/show once, then reused for every batch.
+        """
+        if self._context_length is None:
+            self._context_length = self._read_context_length()
+        return self._context_length
+    
+    def _read_context_length(self):
+        try:
+            info = self.ollama_client.show(self.model_name)
+            model_info = info.get('modelinfo') or info.get('model_info') or {}
+            for key, value in model_info.items():
+                if key.endswith('.context_length'):
+                    return min(int(value), self.batch_context)
+            
+            match = re.search(r'num_ctx\s+(\d+)', info.get('parameters') or '')
+            if match:
+                return min(int(match.group(1)), self.batch_context)
+        except Exception as e:
+            print(f" Could not read context size for {self.model_name}: {e}")
+        
+        return 2048  # Ollama's default num_ctx
+    
+    def analysis_batch_size(self):
+        """How many articles fit into one analysis request"""
+        if self._batch_size is None:
+            # ~4 chars per token: 800 chars of content plus a 150 token answer per article
+            per_article_tokens = 800 // 4 + 30 + 150
+            preamble_tokens = 120
+            fits = (self.context_length() - preamble_tokens) // per_article_tokens
+            self._batch_size = max(1, min(self.max_batch_size, fits))
+            print(f" Batch analysis: {self._batch_size} articles per request")
+        return self._batch_size
+    
+    def _valid_analysis(self, analysis):
+        return (
+            isinstance(analysis, dict)
+            and isinstance(analysis.get('headline'), str)
+            and isinstance(analysis.get('summary'), str)
+            and isinstance(analysis.get('key_topics'), list)
+            and analysis.get('sentiment') in ('positive', 'negative', 'neutral')
+            and analysis.get('urgency') in ('high', 'medium', 'low')
+        )
+    
+    def analyze_batch_with_ollama(self, items):
+        """Analyze several (content, category) pairs in one Ollama request
+        
+        The model is asked for a JSON array with one analysis per article.
+        Elements that are missing or fail validation are re-analyzed one by one.
+        """
+        results = [None] * len(items)
+        cache_keys = [None] * len(items)
+        if self.analysis_cache:
+            for i, (content, category) in enumerate(items):
+                cache_keys[i] = self.analysis_cache.key(self.model_name, category, content)
+                results[i] = self.analysis_cache.get(cache_keys[i])
+        
+        pending = [i for i, analysis in enumerate(results) if analysis is None]
+        if len(pending) <= 1:
+            for i in pending:
+                results[i] = self.analyze_with_ollama_fast(*items[i])
+            return results
+        
+        articles_text = "\n\n".join(
+            f"Article {n} ({items[i][1]}): {items[i][0][:800]}..."
+            for n, i in enumerate(pending, 1)
+        )
+        prompt = BATCH_ANALYSIS_PROMPT.format(count=len(pending), articles=articles_text)
+        
+        try:
+            response_text = self.ollama_json(
+                prompt,
+                options={
+                    'temperature': 0.1,
+                    'num_predict': 150 * len(pending),
+                    'num_ctx': self.context_length(),
+                    'top_k': 10,
+                    'top_p': 0.9
+                },
+                schema=batch_analysis_schema(len(pending))
+            )
+            start, end = response_text.find('['), response_text.rfind(']')
+            parsed = json.loads(response_text[start:end + 1]) if 0 <= start < end else []
+            
+            if isinstance(parsed, list):
+                for i, analysis in zip(pending, parsed):
+                    if self._valid_analysis(analysis):
+                        results[i] = analysis
+                        if self.analysis_cache:
+                            self.analysis_cache.put(cache_keys[i], analysis)
+        except Exception as e:
+            self.metrics.record_error('analyze', e)
+            print(f" Batch analysis failed for {len(pending)} articles: {e}")
+        
+        failed = [i for i, analysis in enumerate(results) if analysis is None]
+        if failed:
+            print(f" Batch analysis: {len(failed)}/{len(pending)} items need single-article retry")
+        for i in failed:
+            results[i] = self.analyze_with_ollama_fast(*items[i])
+        return results
+    
+    def analyze_articles(self, articles):
+        """Analyze a list of articles in place, batched when batch_analysis is on"""
+        if not self.batch_analysis or len(articles) == 1:
+            return [self.analyze_article(article) for article in articles]
+        
+        start = time.perf_counter()
+        started_at = time.time()
+        try:
+            analyses = self.analyze_batch_with_ollama([(a['content'], a['category']) for a in articles])
+            # Every article in the batch waited for the whole request
+            duration = time.perf_counter() - start
+            for article in articles:
+                self.metrics.record_span('analyze', duration, article.get('url'), started_at, batch=len(articles))
+            for article, analysis in zip(articles, analyses):
+                self.apply_analysis(article, analysis)
+                print(f" Analyzed: {article.get('title', 'Untitled')[:50]}...")
+        except Exception as e:
+            print(f" Analysis error: {e}")
+        return articles
     
     def process_articles_parallel(self, articles):
         """PARALLELIZED article processing with Ollama"""
         print(f" Analyzing {len(articles)} articles with Ollama...")
         
-        def analyze_single_article(article):
-            try:
-                analysis = self.analyze_with_ollama_fast(article['content'], article['category'])
-                
-                # Merge analysis with article
-                article['ai_analysis'] = analysis
-                
-                if not article.get('title') and analysis.get('headline'):
-                    article['title'] = analysis['headline']
-                
-                article['summary'] = analysis.get('summary', '')
-                article['topics'] = analysis.get('key_topics', [])
-                article['sentiment'] = analysis.get('sentiment', 'neutral')
-                article['urgency'] = analysis.get('urgency', 'medium')
-                
-                print(f" Analyzed: {article.get('title', 'Untitled')[:50]}...")
-                return article
-            except Exception as e:
-                print(f" Analysis error: {e}")
-                return article
+        batch_size = self.analysis_batch_size() if self.batch_analysis else 1
+        batches = [articles[i:i + batch_size] for i in range(0, len(articles), batch_size)]
         
         # Process with limited parallelization for Ollama stability
         processed_articles = []
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            future_to_article = {executor.submit(analyze_single_article, article): article for article in articles}
+        with ThreadPoolExecutor(max_workers=self.pipeline_workers['analyze']) as executor:
+            future_to_batch = {executor.submit(self.analyze_articles, batch): batch for batch in batches}
             
-            for future in as_completed(future_to_article):
+            for future in as_completed(future_to_batch):
                 try:
-                    processed_article = future.result()
-                    processed_articles.append(processed_article)
+                    processed_articles.extend(future.result())
                 except Exception as e:
                     print(f" Processing error: {e}")
         
         return processed_articles
     
-    def calculate_sentiment_distribution(self, articles):
-        """Calculate sentiment distribution"""
-        sentiments = [a.get('sentiment', 'neutral') for a in articles if a.get('sentiment')]
+    def analyze_article(self, article):
+        """Run Ollama on one article and merge the result into it"""
+        try:
+            with self.metrics.span('analyze', article.get('url')):
+                analysis = self.analyze_with_ollama_fast(article['content'], article['category'])
+            self.apply_analysis(article, analysis)
+            
+            print(f" Analyzed: {article.get('title', 'Untitled')[:50]}...")
+            return article
+        except Exception as e:
+            print(f" Analysis error: {e}")
+            return article
+    
+    def apply_analysis(self, article, analysis):
+        """Merge an Ollama analysis into the article record"""
+        article['ai_analysis'] = analysis
+        
+        if not article.get('title') and analysis.get('headline'):
+            article['title'] = analysis['headline']
+        return article
+    
+    def _has_analysis(self, article):
+        analysis = article.get('ai_analysis')
+        return bool(analysis) and analysis != FALLBACK_ANALYSIS
+    
+    def reset_near_duplicates(self):
+        """Start a fresh near-duplicate index (once per crawl)"""
+        self.near_duplicates = None
+        if self.near_duplicate_distance is not None:
+            self.near_duplicates = NearDuplicateIndex(self.near_duplicate_distance, self.near_duplicate_shingle)
+        self._representative_analyses = {}
+        self._failed_representatives = set()
+        self._pending_siblings = {}
+    
+    def rotate_near_duplicates(self):
+        """Start a new near-duplicate window (daemon mode) without losing duplicates still waiting"""
+        with self.lock:
+            if self.near_duplicate_distance is not None:
+                self.near_duplicates = NearDuplicateIndex(self.near_duplicate_distance, self.near_duplicate_shingle)
+            self._representative_analyses = {}
+            self._failed_representatives = set()
+    
+    def hold_near_duplicate(self, category, article):
+        """Route an extracted article through the near-duplicate index
         
-        distribution = {'positive': 0, 'negative': 0, 'neutral': 0}
-        for sentiment in sentiments:
-            if sentiment in distribution:
-                distribution[sentiment] += 1
+        Returns (is_duplicate, ready) - duplicates are not analyzed; they wait for
+        their representative's analysis, and ready lists the (category, article)
+        pairs that already got it.
+        """
+        if not self.near_duplicates:
+            return False, []
         
-        return distribution
+        representative = self.near_duplicates.find_or_add(article['url'], article['content'])
+        if representative is None:
+            return False, []
+        
+        with self.lock:
+            if representative in self._failed_representatives:
+                return False, []
+            article['duplicate_of'] = representative
+            analysis = self._representative_analyses.get(representative)
+            if analysis is None:
+                self._pending_siblings.setdefault(representative, []).append((category, article))
+                return True, []
+        
+        self.apply_analysis(article, copy.deepcopy(analysis))
+        return True, [(category, article)]
     
-    def extract_top_topics(self, articles):
-        """Extract most common topics"""
-        all_topics = []
-        for article in articles:
-            topics = article.get('topics', [])
-            all_topics.extend(topics)
+    def release_near_duplicates(self, article):
+        """Copy a representative's analysis to its waiting duplicates and return them
+        
+        Callers use orphan_near_duplicates() instead when the representative
+        only got FALLBACK_ANALYSIS, so the placeholder is never copied.
+        """
+        if not self.near_duplicates:
+            return []
+        
+        analysis = article.get('ai_analysis') or dict(FALLBACK_ANALYSIS)
+        with self.lock:
+            self._representative_analyses[article['url']] = analysis
+            siblings = self._pending_siblings.pop(article['url'], [])
+        
+        for _, sibling in siblings:
+            self.apply_analysis(sibling, copy.deepcopy(analysis))
+        return siblings
+    
+    def orphan_near_duplicates(self, article):
+        """Give up on a representative whose analysis failed (or fell back) and return its waiting duplicates
+        
+        They (and any later duplicate of it) are then analyzed on their own.
+        """
+        if not self.near_duplicates:
+            return []
         
-        topic_counts = {}
-        for topic in all_topics:
-            topic_counts[topic] = topic_counts.get(topic, 0) + 1
+        with self.lock:
+            self._failed_representatives.add(article['url'])
+            siblings = self._pending_siblings.pop(article['url'], [])
+        
+        for _, sibling in siblings:
+            sibling.pop('duplicate_of', None)
+        return siblings
+    
+    def split_recently_checked(self, urls):
+        """Split URLs into (to_fetch, reused) using the seen-article index"""
+        if not self.article_index:
+            return list(urls), []
         
-        return sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        to_fetch, reused = [], []
+        cutoff = time.time() - self.recheck_hours * 3600
+        for url in urls:
+            entry = self.article_index.lookup(url)
+            if entry and entry[2] >= cutoff and self._has_analysis(entry[1]):
+                reused.append(entry[1])
+            else:
+                to_fetch.append(url)
+        return to_fetch, reused
+    
+    def split_changed(self, articles):
+        """Split extracted articles into (needs_analysis, unchanged) by content hash"""
+        needs_analysis, unchanged = [], []
+        for article in articles:
+            article['content_hash'] = ArticleIndex.content_hash(article['content'])
+            entry = self.article_index.lookup(article['url']) if self.article_index else None
+            
+            if entry and entry[0] == article['content_hash'] and self._has_analysis(entry[1]):
+                self.apply_analysis(article, entry[1]['ai_analysis'])
+                self.article_index.touch(article['url'])
+                unchanged.append(article)
+            else:
+                article['change'] = 'changed' if entry else 'new'
+                needs_analysis.append(article)
+        return needs_analysis, unchanged
+    
+    def calculate_sentiment_distribution(self, articles):
+        """Calculate sentiment distribution"""
+        return CrawlStats.from_articles(articles).global_stats.sentiment_distribution()
+    
+    def extract_top_topics(self, articles):
+        """Extract most common topics"""
+        return CrawlStats.from_articles(articles).global_stats.top_topics()
     
     def generate_summary(self, all_articles):
         """Generate comprehensive summary"""
-        if not all_articles:
-            return {}
+        return CrawlStats.from_articles(all_articles).summary()
+    
+    def run_pipeline(self, delta_only=False, max_per_category=5, on_article=None, keep_articles=True,
+                     scheduler=None):
+        """Streaming crawl - discovery, extraction and analysis overlap across all categories
         
-        sentiments = [a.get('sentiment', 'neutral') for a in all_articles]
-        sentiment_dist = {'positive': 0, 'negative': 0, 'neutral': 0}
-        for s in sentiments:
-            if s in sentiment_dist:
-                sentiment_dist[s] += 1
+        Each stage has its own worker threads and hands work to the next stage
+        through a bounded queue, so an article goes to Ollama as soon as it is
+        extracted and a slow stage blocks its producers instead of piling up
+        pages in memory. Returns ({category: [articles]}, change_counts); with
+        keep_articles=False the lists hold URLs and on_article gets the articles.
         
-        all_topics = []
-        for article in all_articles:
-            all_topics.extend(article.get('topics', []))
+        Discovered links go through a CrawlFrontier rather than straight to
+        extraction: seed pages are read whole, the frontier hands out the
+        best-scored URLs within each category's quota, and with max_depth > 1
+        links inside extracted articles are queued too. The crawl ends once
+        discovery is done and the frontier has nothing queued or in flight.
         
-        return {
-            'total_articles': len(all_articles),
-            'total_categories': len(set(a.get('category', 'unknown') for a in all_articles)),
-            'avg_word_count': sum(a.get('word_count', 0) for a in all_articles) / len(all_articles) if all_articles else 0,
-            'global_sentiment': sentiment_dist,
-            'unique_topics': len(set(all_topics)),
-            'all_topics': list(set(all_topics))[:20]
-        }
-    
-    def crawl_all_content(self):
-        """Main crawling function"""
-        print(" Starting Improved BBC Crawler")
+        With fetch_backend="async" every fetch runs on the AsyncFetchEngine:
+        article downloads are started as the frontier hands out URLs (up to
+        max_concurrency not yet extracted) and reach the extract workers as
+        they complete, so those threads only parse.
         
-        all_data = {
-            'crawl_metadata': {
-                'started': datetime.now().isoformat(),
-                'method': 'Direct Requests + BeautifulSoup + Ollama',
-                'model_used': self.model_name,
-                'version': '3.0-IMPROVED'
-            },
-            'categories': {},
-            'summary': {},
-            'all_articles': []
-        }
+        With a RecrawlScheduler the discover workers poll seeds as they come due
+        instead of once each, and the pipeline runs until scheduler.stop();
+        articles then only go to on_article, and seed pages keep the
+        max_per_category cut instead of quotas.
+        """
+        seed_queue = queue.Queue()
+        engine = self.fetch_engine
+        # The frontier is the real buffer, so extraction only holds what its
+        # workers are about to take and URLs are picked by score as late as possible.
+        # Async fetches are bounded by in_flight instead: completion callbacks run
+        # on the engine's loop and must never block on a full queue.
+        extract_queue = queue.Queue() if engine else queue.Queue(maxsize=max(1, self.pipeline_workers['extract']))
+        in_flight = threading.BoundedSemaphore(self.max_concurrency)
+        analyze_queue = queue.Queue(maxsize=self.queue_size)
         
-        total_articles = []
+        results = {category: [] for category in self.url_patterns}
+        change_counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        discovery_done = threading.Event()
+        
+        quotas = {}
+        for category, spec in self.url_patterns.items():
+            source, urls, max_age_hours = self.category_sources(spec)
+            if scheduler is not None:
+                continue
+            for url in urls:
+                seed_queue.put((category, url, source, max_age_hours))
+            if isinstance(self.category_quota, dict):
+                quotas[category] = self.category_quota.get(category)
+            elif self.category_quota is not None:
+                quotas[category] = self.category_quota
+            else:
+                quotas[category] = max_per_category * len(urls)
+        
+        # A daemon re-queues articles its seeds still list once recheck_hours
+        # have passed; the conditional GET then skips the unchanged ones
+        revisit_after = self.recheck_hours * 3600 if scheduler is not None else None
+        frontier = CrawlFrontier(self.max_depth, quotas, self.category_weights, self.frontier_size,
+                                 revisit_after=revisit_after)
+        self.frontier = frontier
+        seed_cut = max_per_category if scheduler is not None else None
+        
+        def emit(category, article):
+            with self.lock:
+                change_counts[article['change']] += 1
+                if delta_only and article['change'] == 'unchanged':
+                    return
+                if scheduler is None:
+                    results[category].append(article if keep_articles else article['url'])
+            if on_article:
+                on_article(category, article)
+        
+        def finish(category, article):
+            if self.article_index:
+                self.article_index.record(article)
+            emit(category, article)
+        
+        def follow(page_url, links, category, depth):
+            """Queue the article links found on an extracted page one level deeper"""
+            if depth >= self.max_depth:
+                return
+            with self.metrics.span('classify', page_url, links=len(links)):
+                classified = [self.url_classifier.classify(urljoin(page_url, href)) for href in links]
+            frontier.push([link for link in classified if link], category, depth + 1)
+        
+        def discover_worker():
+            while True:
+                if scheduler is None:
+                    try:
+                        category, seed_url, source, max_age_hours = seed_queue.get_nowait()
+                    except queue.Empty:
+                        return
+                else:
+                    seed = scheduler.next_due()
+                    if seed is None:
+                        return
+                    category, seed_url, source, max_age_hours = seed
+                
+                try:
+                    print(f"🔍 Discovering articles from: {seed_url}")
+                    html = self.fetch_url(seed_url, timeout=15)
+                    links = self.discover_links(seed_url, html, seed_cut, source, max_age_hours)
+                except Exception as e:
+                    print(f" Error discovering articles from {seed_url}: {e}")
+                    if scheduler is not None:
+                        scheduler.record(seed_url, None)
+                    continue
+                
+                if scheduler is not None:
+                    new_links = scheduler.record(seed_url, links)
+                    if new_links:
+                        print(f" {len(new_links)} new links on {seed_url}")
+                
+                frontier.push([(url, self.categorize_url(url)) for url in links], category, 1)
+                self.metrics.set_gauge('queue_depth', len(frontier.heap), queue='frontier')
+        
+        def feed_worker():
+            # Hand the best-scored URLs to extraction until discovery is over and
+            # nothing queued or in flight can add more links
+            while True:
+                item = frontier.pop(timeout=0.2)
+                if item is None:
+                    if discovery_done.is_set() and frontier.idle():
+                        return
+                    continue
+                url, category, depth = item
+                
+                to_fetch, reused = self.split_recently_checked([url])
+                for article in reused:
+                    article['change'] = 'unchanged'
+                    emit(category, article)
+                if not to_fetch:
+                    frontier.done()
+                for article_url in to_fetch:
+                    if engine:
+                        # Blocks while max_concurrency pages are fetching or waiting
+                        # for extraction (backpressure)
+                        in_flight.acquire()
+                        print(f" Processing: {article_url}")
+                        fetched = engine.submit(article_url, 20, self.article_sink_factory())
+                        fetched.add_done_callback(
+                            lambda future, item=(category, article_url, depth): extract_queue.put(item + (future,))
+                        )
+                    else:
+                        # Blocks while extraction is behind (backpressure)
+                        extract_queue.put((category, article_url, depth, None))
+                    self.metrics.set_gauge('queue_depth', len(frontier.heap), queue='frontier')
+        
+        def extract(category, url, depth, fetched=None):
+            on_links = lambda links: follow(url, links, category, depth)
+            try:
+                if fetched is None:
+                    print(f" Processing: {url}")
+                    article = self.fetch_article(url, timeout=20, on_links=on_links)
+                else:
+                    body = fetched.result()
+                    if body is None:
+                        return  # Already retried and recorded by the engine
+                    article = self.article_from_body(url, body, on_links)
+                if not article:
+                    return
+                to_analyze, unchanged = self.split_changed([article])
+            except Exception as e:
+                print(f" Error extracting {url}: {e}")
+                return
+            
+            for article in unchanged:
+                article['change'] = 'unchanged'
+                emit(category, article)
+            for article in to_analyze:
+                is_duplicate, ready = self.hold_near_duplicate(category, article)
+                for ready_category, sibling in ready:
+                    finish(ready_category, sibling)
+                if not is_duplicate:
+                    analyze_queue.put((category, article))
+                    self.metrics.set_gauge('queue_depth', analyze_queue.qsize(), queue='analyze')
+        
+        def extract_worker():
+            while True:
+                item = extract_queue.get()
+                if item is None:
+                    return
+                try:
+                    extract(*item)
+                finally:
+                    if item[3] is not None:
+                        in_flight.release()
+                    frontier.done()
+        
+        batch_size = self.analysis_batch_size() if self.batch_analysis else 1
+        
+        def analyze_worker():
+            finished = False
+            while not finished:
+                item = analyze_queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                
+                # Batch whatever is already waiting; never hold an article back
+                while len(batch) < batch_size:
+                    try:
+                        item = analyze_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        finished = True
+                        break
+                    batch.append(item)
+                
+                self.analyze_articles([article for _, article in batch])
+                for category, article in batch:
+                    finish(category, article)
+                    if self._has_analysis(article):
+                        siblings = self.release_near_duplicates(article)
+                    else:
+                        # Only the fallback came back: the duplicates get their own analysis
+                        siblings = self.orphan_near_duplicates(article)
+                        if siblings:
+                            self.analyze_articles([sibling for _, sibling in siblings])
+                    for sibling_category, sibling in siblings:
+                        finish(sibling_category, sibling)
+        
+        def start(worker, count):
+            threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, count))]
+            for thread in threads:
+                thread.start()
+            return threads
+        
+        discover_threads = start(discover_worker, self.pipeline_workers['discover'])
+        feed_threads = start(feed_worker, 1)
+        extract_threads = start(extract_worker, self.pipeline_workers['extract'])
+        analyze_threads = start(analyze_worker, self.pipeline_workers['analyze'])
+        
+        for thread in discover_threads:
+            thread.join()
+        discovery_done.set()
+        if scheduler is not None:
+            # Stopping a daemon: finish what is in flight, not the whole backlog
+            frontier.clear()
+        
+        # Shut stages down in order: each one drains before the next gets its sentinels
+        for threads, next_queue, next_threads in (
+            (feed_threads, extract_queue, extract_threads),
+            (extract_threads, analyze_queue, analyze_threads),
+        ):
+            for thread in threads:
+                thread.join()
+            for _ in next_threads:
+                next_queue.put(None)
+        for thread in analyze_threads:
+            thread.join()
+        
+        return results, change_counts
+    
+    def crawl_by_category(self, delta_only=False, max_per_category=5, on_article=None, keep_articles=True):
+        """Barrier crawl - discover, extract and analyze one category at a time"""
+        results = {}
+        change_counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        seen = set()  # canonical URLs, deduplicated across the whole crawl
         
         # Process each category
-        for category, urls in self.url_patterns.items():
+        for category, spec in self.url_patterns.items():
             print(f"\n Processing {category.upper()} category...")
             
             try:
                 # Discover article URLs
-                article_urls = self.discover_article_urls(urls, max_per_category=5)
+                source, urls, max_age_hours = self.category_sources(spec)
+                article_urls = self.discover_article_urls(urls, max_per_category=max_per_category,
+                                                          source=source, max_age_hours=max_age_hours)
+                article_urls = [url for url in article_urls if url not in seen]
+                seen.update(article_urls)
                 
                 if not article_urls:
                     print(f" No articles found for {category}")
@@ -438,55 +4019,272 @@ Content: {content[:800]}...
                 
                 print(f" Found {len(article_urls)} URLs for {category}")
                 
+                # Articles checked recently are reused straight from the index
+                article_urls, unchanged = self.split_recently_checked(article_urls)
+                
                 # Direct content extraction
-                articles = self.extract_content_direct(article_urls)
+                articles = self.extract_content_direct(article_urls) if article_urls else []
                 
-                if articles:
-                    # AI processing
-                    processed_articles = self.process_articles_parallel(articles)
-                    
-                    # Store category data
-                    category_data = {
-                        'category_name': category,
-                        'total_articles': len(processed_articles),
-                        'articles': processed_articles,
-                        'statistics': {
-                            'avg_word_count': sum(a.get('word_count', 0) for a in processed_articles) / len(processed_articles) if processed_articles else 0,
-                            'sentiment_distribution': self.calculate_sentiment_distribution(processed_articles),
-                            'top_topics': self.extract_top_topics(processed_articles)
-                        }
-                    }
-                    
-                    all_data['categories'][category] = category_data
-                    total_articles.extend(processed_articles)
-                    
-                    print(f" {category}: {len(processed_articles)} articles processed")
+                # Only new or changed content goes through Ollama
+                articles, unchanged_content = self.split_changed(articles)
+                unchanged.extend(unchanged_content)
+                
+                # Near-duplicates wait for their representative's analysis
+                representatives, duplicates = [], []
+                for article in articles:
+                    is_duplicate, ready = self.hold_near_duplicate(category, article)
+                    duplicates.extend(sibling for _, sibling in ready)
+                    if not is_duplicate:
+                        representatives.append(article)
+                
+                processed_articles = self.process_articles_parallel(representatives) if representatives else []
+                # Representatives that failed or only got the fallback analysis
+                # leave their duplicates to be analyzed on their own
+                analyzed = {id(article) for article in processed_articles if self._has_analysis(article)}
+                orphans = [sibling for article in representatives if id(article) not in analyzed
+                           for _, sibling in self.orphan_near_duplicates(article)]
+                if orphans:
+                    processed_articles.extend(self.process_articles_parallel(orphans))
+                for article in list(processed_articles):
+                    processed_articles.extend(sibling for _, sibling in self.release_near_duplicates(article))
+                processed_articles.extend(duplicates)
+                
+                for article in processed_articles:
+                    change_counts[article['change']] += 1
+                    if self.article_index:
+                        self.article_index.record(article)
+                for article in unchanged:
+                    article['change'] = 'unchanged'
+                change_counts['unchanged'] += len(unchanged)
+                print(f" {category}: {len(processed_articles)} new/changed, {len(unchanged)} unchanged")
+                
+                if not delta_only:
+                    processed_articles = processed_articles + unchanged
+                
+                if on_article:
+                    for article in processed_articles:
+                        on_article(category, article)
+                results[category] = processed_articles if keep_articles else [a['url'] for a in processed_articles]
                 
             except Exception as e:
                 print(f" Error processing {category}: {e}")
                 continue
         
+        return results, change_counts
+    
+    def crawl_all_content(self, delta_only=False, output_path=None, max_per_category=5):
+        """Main crawling function (delta_only=True emits just new/changed articles)
+        
+        Each article is listed once, in all_articles, and categories refer to
+        it by URL. With output_path set, each article is instead appended to
+        that JSON Lines file as soon as it is analyzed (and then dropped from
+        memory), and the summary record is written last.
+        """
+        print(" Starting Improved BBC Crawler")
+        
+        all_data = {
+            'crawl_metadata': {
+                'started': datetime.now().isoformat(),
+                'method': 'Direct Requests + Single-Pass Extractor + Ollama',
+                'model_used': self.model_name,
+                'version': '3.0-IMPROVED',
+                'mode': 'pipeline' if self.pipeline else 'by-category'
+            },
+            'categories': {},
+            'summary': {},
+            'all_articles': []
+        }
+        
+        writer = JSONLWriter(output_path) if output_path else None
+        stats = CrawlStats()
+        self.failed_urls = {}
+        self.stream_stats = {'pages': 0, 'cut_short': 0, 'bytes_read': 0}
+        self.reset_near_duplicates()
+        # Fork the parse workers before any crawl thread exists
+        self.start_parse_pool()
+        if self.warm_up:
+            self.start_warm_up()
+        
+        def on_article(category, article):
+            stats.add(category, article)
+            self.metrics.inc('articles_total', category=category, change=article.get('change', 'new'))
+            if writer:
+                with self.metrics.span('save', article['url']):
+                    writer.write(dict(article, type='article', crawl_category=category))
+        
+        try:
+            if self.pipeline:
+                results, change_counts = self.run_pipeline(delta_only, max_per_category, on_article=on_article,
+                                                           keep_articles=writer is None)
+            else:
+                results, change_counts = self.crawl_by_category(delta_only, max_per_category, on_article=on_article,
+                                                                keep_articles=writer is None)
+        except BaseException:
+            if writer:
+                writer.abort()
+            raise
+        
+        total_articles = []
+        article_count = 0
+        for category, processed_articles in results.items():
+            if not processed_articles:
+                continue
+            
+            # Store category data
+            category_data = {
+                'category_name': category,
+                'total_articles': len(processed_articles),
+                'statistics': stats.category_statistics(category)
+            }
+            
+            # Articles live in all_articles (or the JSONL file) - refer to them by URL
+            if writer:
+                category_data['article_urls'] = processed_articles
+            else:
+                category_data['article_urls'] = [a['url'] for a in processed_articles]
+                total_articles.extend(processed_articles)
+            
+            all_data['categories'][category] = category_data
+            article_count += len(processed_articles)
+            
+            print(f" {category}: {len(processed_articles)} articles processed")
+        
         # Generate final summary
-        all_data['all_articles'] = total_articles
-        all_data['summary'] = self.generate_summary(total_articles)
+        all_data['summary'] = stats.summary()
+        if writer:
+            del all_data['all_articles']
+        else:
+            all_data['all_articles'] = total_articles
         all_data['crawl_metadata']['completed'] = datetime.now().isoformat()
-        all_data['crawl_metadata']['success'] = len(total_articles) > 0
+        all_data['crawl_metadata']['success'] = article_count > 0
+        all_data['crawl_metadata']['delta_only'] = delta_only
+        all_data['crawl_metadata']['incremental'] = change_counts
+        all_data['crawl_metadata']['failed_urls'] = dict(self.failed_urls)
+        all_data['crawl_metadata']['extraction'] = dict(
+            self.stream_stats, streaming=self.stream_extraction, parse_workers=self.parse_workers
+        )
+        if self.frontier:
+            all_data['crawl_metadata']['frontier'] = self.frontier.snapshot()
+        if self.near_duplicates:
+            all_data['crawl_metadata']['near_duplicates'] = self.near_duplicates.stats()
+        all_data['crawl_metadata']['rate_limiter'] = {
+            'hosts': self.rate_limiter.snapshot(),
+            'retries': self.retry_policy.snapshot()
+        }
+        if self.analysis_cache:
+            all_data['crawl_metadata']['analysis_cache'] = self.analysis_cache.stats()
+        all_data['crawl_metadata']['ollama_endpoints'] = self.ollama_client.snapshot()
+        self.collect_metrics()
+        all_data['crawl_metadata']['metrics'] = self.metrics.snapshot()
+        if self.metrics_path:
+            self.export_metrics(self.metrics_path)
+        
+        if writer:
+            all_data['crawl_metadata']['output_file'] = output_path
+            writer.write(dict(all_data, type='summary'))
+            writer.close()
+            print(f"\n Streamed {writer.count - 1} articles to {output_path}")
         
         return all_data
     
+    def run_daemon(self, output_path='bbc_improved_data.jsonl', max_per_category=20, initial_interval=300.0,
+                   min_interval=60.0, max_interval=3600.0, status_interval=60.0, duplicate_window_hours=24,
+                   stop_event=None):
+        """Crawl continuously, re-polling each discovery page on an adaptive schedule
+        
+        One pipeline runs for the life of the process, fed by a RecrawlScheduler,
+        so the parse pool, connections and the warm Ollama model are set up
+        once and links found on a poll go straight to extraction. Only new or
+        changed articles are emitted, each appended to output_path (JSON Lines)
+        as soon as it is analyzed; articles a seed still lists are re-checked
+        (conditional GET) once recheck_hours have passed. Every status_interval seconds a status line
+        is printed and metrics are exported to metrics_path. Stops on Ctrl+C or
+        once stop_event is set, after finishing the articles in flight, and
+        returns the change counts.
+        """
+        print(" Starting BBC crawler daemon")
+        
+        seeds = []
+        for category, spec in self.url_patterns.items():
+            source, urls, max_age_hours = self.category_sources(spec)
+            seeds.extend((category, url, source, max_age_hours) for url in urls)
+        scheduler = RecrawlScheduler(seeds, initial_interval, min_interval, max_interval)
+        
+        writer = JSONLWriter(output_path, append=True) if output_path else None
+        emitted = {'articles': 0}
+        self.failed_urls = {}
+        self.stream_stats = {'pages': 0, 'cut_short': 0, 'bytes_read': 0}
+        self.reset_near_duplicates()
+        self.start_parse_pool()
+        if self.warm_up:
+            self.start_warm_up()
+        
+        def on_article(category, article):
+            self.metrics.inc('articles_total', category=category, change=article.get('change', 'new'))
+            with self.lock:
+                emitted['articles'] += 1
+            if writer:
+                with self.metrics.span('save', article['url']):
+                    writer.write(dict(article, type='article', crawl_category=category))
+        
+        outcome = {}
+        
+        def run():
+            outcome['result'] = self.run_pipeline(True, max_per_category, on_article=on_article, scheduler=scheduler)
+        
+        pipeline = threading.Thread(target=run, daemon=True)
+        pipeline.start()
+        
+        stop_event = stop_event or threading.Event()
+        window_started = time.monotonic()
+        try:
+            while pipeline.is_alive() and not stop_event.wait(status_interval):
+                if duplicate_window_hours and time.monotonic() - window_started > duplicate_window_hours * 3600:
+                    self.rotate_near_duplicates()
+                    window_started = time.monotonic()
+                self.report_daemon_status(scheduler, emitted['articles'])
+        except KeyboardInterrupt:
+            print("\n Stopping daemon, finishing the articles in flight...")
+        finally:
+            scheduler.stop()
+            pipeline.join()
+            if writer:
+                writer.close()
+            self.report_daemon_status(scheduler, emitted['articles'])
+        
+        return outcome.get('result', ({}, {}))[1]
+    
+    def report_daemon_status(self, scheduler, articles):
+        """Print one daemon status line and export the metrics, with recrawl intervals as gauges"""
+        schedule = scheduler.snapshot()
+        for url, seed in schedule.items():
+            self.metrics.set_gauge('recrawl_interval_seconds', seed['interval'], seed=url)
+        
+        # Failures are reported per status period, so the dict stays small
+        failed, self.failed_urls = self.failed_urls, {}
+        upcoming = min(schedule.items(), key=lambda item: item[1]['next_poll_in'], default=None)
+        busiest = min(schedule.items(), key=lambda item: item[1]['interval'], default=None)
+        print(f" Daemon: {articles} new/changed articles, {len(failed)} failed URLs"
+              + (f", next poll in {upcoming[1]['next_poll_in']:.0f}s ({upcoming[0]})" if upcoming else "")
+              + (f", busiest {busiest[0]} every {busiest[1]['interval']:.0f}s" if busiest else ""))
+        
+        if self.metrics_path:
+            self.collect_metrics()
+            self.export_metrics(self.metrics_path)
+    
     def save_data(self, data, filename='bbc_crawl_improved.json'):
         """Save data to JSON file"""
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                json.dump(data, f, indent=2, ensure_ascii=False, default=json_default)
             print(f"\n Data saved to {filename}")
             return True
         except Exception as e:
             print(f" Error saving data: {e}")
             return False
     
-    def print_results(self, data):
-        """Print results summary and complete JSON"""
+    def print_results(self, data, show_json=True):
+        """Print results summary and (optionally) the complete JSON"""
         print("\n" + "="*80)
         print(" BBC CRAWL RESULTS")
         print("="*80)
@@ -505,34 +4303,38 @@ Content: {content[:800]}...
         for cat_name, cat_data in categories.items():
             print(f"   {cat_name.upper()}: {cat_data.get('total_articles', 0)} articles")
         
+        if not show_json:
+            return
+        
         # Print complete JSON
         print("\n" + "="*80)
         print(" COMPLETE JSON OUTPUT")
         print("="*80)
-        print(json.dumps(data, indent=2, ensure_ascii=False))
+        print(json.dumps(data, indent=2, ensure_ascii=False, default=json_default))
 
 # Usage
-if _name_ == "_main_":
+if __name__ == "__main__":
     print(" Improved BBC Crawler - More Reliable!")
     
-    crawler = ImprovedBBCCrawler(model_name="llama3.2:latest")
-    
-    # Run the crawler
-    data = crawler.crawl_all_content()
-    
-    if data and data.get('summary', {}).get('total_articles', 0) > 0:
-        # Print results and JSON
-        crawler.print_results(data)
+    with ImprovedBBCCrawler(model_name="llama3.2:latest") as crawler:
+        if "--daemon" in sys.argv[1:]:
+            # Long-running mode: poll category pages adaptively until Ctrl+C
+            crawler.run_daemon(output_path='bbc_improved_data.jsonl')
+            sys.exit(0)
         
-        # Save data
-        crawler.save_data(data, 'bbc_improved_data.json')
+        # Run the crawler, streaming articles to disk as they are analyzed
+        data = crawler.crawl_all_content(output_path='bbc_improved_data.jsonl')
         
-        print(f"\n Crawling completed successfully!")
-        print(f" File saved: bbc_improved_data.json")
+        if data and data.get('summary', {}).get('total_articles', 0) > 0:
+            # Print results summary (articles are in the JSONL file)
+            crawler.print_results(data, show_json=False)
+            
+            print(f"\n Crawling completed successfully!")
+            print(f" File saved: bbc_improved_data.jsonl")
         
-    else:
-        print(" No articles were successfully extracted.")
-        print("Possible issues:")
-        print("- Network connectivity")
-        print("- BBC website blocking requests")
-        print("- Ollama not running")
\ No newline at end of file
+        else:
+            print(" No articles were successfully extracted.")
+            print("Possible issues:")
+            print("- Network connectivity")
+            print("- BBC website blocking requests")
+            print("- Ollama not running")
\ No newline at end of file
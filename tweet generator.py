@@ -10,7 +10,7 @@ import aiohttp
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(_name_)
+logger = logging.getLogger(__name__)
 
 @dataclass
 class NewsArticle:
@@ -24,6 +24,7 @@ class NewsArticle:
     urgency: str
     word_count: int
     category: str
+    duplicate_of: Optional[str] = None
 
 @dataclass
 class TweetWithHashtags:
@@ -33,19 +34,46 @@ class TweetWithHashtags:
     article_url: str
     topics: List[str]
 
+class AsyncRateLimiter:
+    """Spaces out request starts by at least min_interval seconds across every task sharing it"""
+    
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_start = 0.0
+    
+    async def wait(self):
+        """Wait for the next free request slot"""
+        now = asyncio.get_running_loop().time()
+        # Claim the slot before sleeping, so concurrent callers queue up behind it
+        start = max(now, self._next_start)
+        self._next_start = start + self.min_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
 class NewsProcessor:
     """Main class to process news and generate tweets with hashtags"""
     
-    def _init_(self, gemini_api_key: str, ollama_base_url: str = "http://localhost:11434"):
+    def __init__(self, gemini_api_key: str, ollama_base_url: str = "http://localhost:11434",
+                 ollama_concurrency: int = 2, gemini_concurrency: int = 4, pipeline_queue_size: int = 8,
+                 request_interval: float = 0.5):
         """
         Initialize the processor
         
         Args:
             gemini_api_key: Your Gemini API key
             ollama_base_url: Ollama server URL (default: localhost:11434)
+            ollama_concurrency: Max Ollama requests in flight in async mode
+            gemini_concurrency: Max Gemini requests in flight in async mode
+            pipeline_queue_size: Tweets waiting for hashtags before Ollama workers pause
+            request_interval: Minimum seconds between any two requests in async mode
         """
         self.gemini_api_key = gemini_api_key
         self.ollama_base_url = ollama_base_url
+        self.ollama_concurrency = ollama_concurrency
+        self.gemini_concurrency = gemini_concurrency
+        self.pipeline_queue_size = pipeline_queue_size
+        self.request_interval = request_interval
+        self.stage_stats: Dict = {}
         
         # Configure Gemini
         genai.configure(api_key=gemini_api_key)
@@ -54,31 +82,53 @@ class NewsProcessor:
         # Ollama configuration
         self.ollama_model = "llama3.2:latest"
         
+    def _iter_article_records(self, json_file_path: str):
+        """Yield (category_name, article_data) from a crawler JSON or JSONL file"""
+        with open(json_file_path, 'r', encoding='utf-8') as file:
+            if json_file_path.endswith('.jsonl'):
+                # Streamed crawl output: one article per line, summary record last
+                for line in file:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record.get('type') == 'article':
+                        yield record.get('crawl_category', ''), record
+                return
+            
+            data = json.load(file)
+        
+        # Each article is stored once in all_articles; categories list their URLs
+        # (files from older crawler versions embed the articles per category)
+        by_url = {article.get('url'): article for article in data.get('all_articles', [])}
+        for category_name, category_data in data.get('categories', {}).items():
+            for article_data in category_data.get('articles', []):
+                yield category_name, article_data
+            for url in category_data.get('article_urls', []):
+                if url in by_url:
+                    yield category_name, by_url[url]
+    
     def load_news_data(self, json_file_path: str) -> List[NewsArticle]:
-        """Load and parse news data from JSON file"""
+        """Load and parse news data from a crawler JSON or JSONL file"""
         try:
-            with open(json_file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-            
             articles = []
-            for category_name, category_data in data.get('categories', {}).items():
-                for article_data in category_data.get('articles', []):
-                    try:
-                        article = NewsArticle(
-                            url=article_data.get('url', ''),
-                            title=article_data.get('title', ''),
-                            content=article_data.get('content', ''),
-                            summary=article_data.get('summary', ''),
-                            topics=article_data.get('topics', []),
-                            sentiment=article_data.get('sentiment', 'neutral'),
-                            urgency=article_data.get('urgency', 'medium'),
-                            word_count=article_data.get('word_count', 0),
-                            category=article_data.get('category', category_name)
-                        )
-                        articles.append(article)
-                    except Exception as e:
-                        logger.warning(f"Error parsing article: {e}")
-                        continue
+            for category_name, article_data in self._iter_article_records(json_file_path):
+                try:
+                    article = NewsArticle(
+                        url=article_data.get('url', ''),
+                        title=article_data.get('title', ''),
+                        content=article_data.get('content', ''),
+                        summary=article_data.get('summary', ''),
+                        topics=article_data.get('topics', []),
+                        sentiment=article_data.get('sentiment', 'neutral'),
+                        urgency=article_data.get('urgency', 'medium'),
+                        word_count=article_data.get('word_count', 0),
+                        category=article_data.get('category', category_name),
+                        duplicate_of=article_data.get('duplicate_of')
+                    )
+                    articles.append(article)
+                except Exception as e:
+                    logger.warning(f"Error parsing article: {e}")
+                    continue
             
             logger.info(f"Loaded {len(articles)} articles from {json_file_path}")
             return articles
@@ -87,11 +137,10 @@ class NewsProcessor:
             logger.error(f"Error loading news data: {e}")
             return []
     
-    def generate_tweet_with_ollama(self, article: NewsArticle) -> Optional[str]:
-        """Generate tweet using Ollama Llama3.2 model"""
-        try:
-            # Create a focused prompt for tweet generation
-            prompt = f"""
+    def _tweet_request(self, article: NewsArticle) -> Dict:
+        """Ollama /api/generate payload for a tweet about the article"""
+        # Create a focused prompt for tweet generation
+        prompt = f"""
             Create a compelling Twitter/X tweet based on this news article. Keep it under 280 characters, engaging, and informative.
 
             Title: {article.title}
@@ -110,19 +159,24 @@ class NewsProcessor:
 
             Tweet:
             """
-            
+        
+        return {
+            "model": self.ollama_model,
+            "prompt": prompt,
+            "stream": False,
+            "options": {
+                "temperature": 0.7,
+                "max_tokens": 100,
+                "top_p": 0.9
+            }
+        }
+    
+    def generate_tweet_with_ollama(self, article: NewsArticle) -> Optional[str]:
+        """Generate tweet using Ollama Llama3.2 model"""
+        try:
             response = requests.post(
                 f"{self.ollama_base_url}/api/generate",
-                json={
-                    "model": self.ollama_model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "max_tokens": 100,
-                        "top_p": 0.9
-                    }
-                },
+                json=self._tweet_request(article),
                 timeout=30
             )
             
@@ -143,10 +197,31 @@ class NewsProcessor:
             logger.error(f"Error generating tweet with Ollama: {e}")
             return None
     
-    def generate_hashtags_with_gemini(self, tweet: str, article: NewsArticle) -> List[str]:
-        """Generate trending hashtags using Gemini API"""
+    async def generate_tweet_with_ollama_async(self, session: aiohttp.ClientSession,
+                                               article: NewsArticle) -> Optional[str]:
+        """Async generate_tweet_with_ollama on a shared aiohttp session"""
         try:
-            prompt = f"""
+            async with session.post(
+                f"{self.ollama_base_url}/api/generate",
+                json=self._tweet_request(article),
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status != 200:
+                    logger.error(f"Ollama API error: {response.status}")
+                    return None
+                result = await response.json(content_type=None)
+            
+            tweet = self._clean_tweet(result.get('response', '').strip())
+            logger.info(f"Generated tweet: {tweet[:50]}...")
+            return tweet
+        
+        except Exception as e:
+            logger.error(f"Error generating tweet with Ollama: {e}")
+            return None
+    
+    def _hashtag_prompt(self, tweet: str, article: NewsArticle) -> str:
+        """Gemini prompt asking for hashtags for the tweet"""
+        return f"""
             Generate 3-5 trending and relevant hashtags for this tweet about a news article.
 
             Tweet: {tweet}
@@ -169,30 +244,46 @@ class NewsProcessor:
             #Politics
             #UK
             """
-            
-            response = self.gemini_model.generate_content(prompt)
-            
-            if response.text:
-                # Parse hashtags from response
-                hashtags = []
-                for line in response.text.strip().split('\n'):
-                    line = line.strip()
-                    if line.startswith('#') and len(line) > 1:
-                        hashtags.append(line)
-                
-                # Limit to 5 hashtags maximum
-                hashtags = hashtags[:5]
-                
-                logger.info(f"Generated hashtags: {', '.join(hashtags)}")
-                return hashtags
-            else:
-                logger.warning("No hashtags generated by Gemini")
-                return []
+    
+    def _parse_hashtags(self, text: str) -> List[str]:
+        """Pick the #hashtags out of a Gemini reply"""
+        if not text:
+            logger.warning("No hashtags generated by Gemini")
+            return []
+        
+        # Parse hashtags from response
+        hashtags = []
+        for line in text.strip().split('\n'):
+            line = line.strip()
+            if line.startswith('#') and len(line) > 1:
+                hashtags.append(line)
+        
+        # Limit to 5 hashtags maximum
+        hashtags = hashtags[:5]
+        
+        logger.info(f"Generated hashtags: {', '.join(hashtags)}")
+        return hashtags
+    
+    def generate_hashtags_with_gemini(self, tweet: str, article: NewsArticle) -> List[str]:
+        """Generate trending hashtags using Gemini API"""
+        try:
+            response = self.gemini_model.generate_content(self._hashtag_prompt(tweet, article))
+            return self._parse_hashtags(response.text)
                 
         except Exception as e:
             logger.error(f"Error generating hashtags with Gemini: {e}")
             return []
     
+    async def generate_hashtags_with_gemini_async(self, tweet: str, article: NewsArticle) -> List[str]:
+        """Async generate_hashtags_with_gemini"""
+        try:
+            response = await self.gemini_model.generate_content_async(self._hashtag_prompt(tweet, article))
+            return self._parse_hashtags(response.text)
+        
+        except Exception as e:
+            logger.error(f"Error generating hashtags with Gemini: {e}")
+            return []
+    
     def _clean_tweet(self, tweet: str) -> str:
         """Clean and format the generated tweet"""
         # Remove common prefixes
@@ -215,24 +306,38 @@ class NewsProcessor:
         
         return tweet
     
-    def process_articles(self, articles: List[NewsArticle], max_articles: int = 10) -> List[TweetWithHashtags]:
-        """Process articles and generate tweets with hashtags"""
-        results = []
-        
+    def _select_articles(self, articles: List[NewsArticle], max_articles: int) -> List[NewsArticle]:
+        """Most urgent articles first, limited to max_articles"""
         # Sort articles by urgency and limit processing
         urgent_articles = [a for a in articles if a.urgency == 'high']
         medium_articles = [a for a in articles if a.urgency == 'medium']
         low_articles = [a for a in articles if a.urgency == 'low']
         
         # Process high urgency first, then medium, then low
-        sorted_articles = (urgent_articles + medium_articles + low_articles)[:max_articles]
+        return (urgent_articles + medium_articles + low_articles)[:max_articles]
+    
+    def _should_skip(self, article: NewsArticle) -> bool:
+        """True for articles that should not get a tweet"""
+        # Near-duplicates share their representative's story - one tweet is enough
+        if article.duplicate_of:
+            logger.info(f"Skipping near-duplicate of {article.duplicate_of}")
+            return True
+        
+        # Skip articles with insufficient content
+        if not article.summary and not article.content:
+            logger.warning(f"Skipping article with no content: {article.title}")
+            return True
+        return False
+    
+    def process_articles(self, articles: List[NewsArticle], max_articles: int = 10) -> List[TweetWithHashtags]:
+        """Process articles and generate tweets with hashtags"""
+        results = []
+        sorted_articles = self._select_articles(articles, max_articles)
         
         for i, article in enumerate(sorted_articles, 1):
             logger.info(f"Processing article {i}/{len(sorted_articles)}: {article.title[:50]}...")
             
-            # Skip articles with insufficient content
-            if not article.summary and not article.content:
-                logger.warning(f"Skipping article with no content: {article.title}")
+            if self._should_skip(article):
                 continue
             
             # Generate tweet with Ollama
@@ -260,6 +365,90 @@ class NewsProcessor:
         logger.info(f"Successfully processed {len(results)} articles")
         return results
     
+    async def process_articles_async(self, articles: List[NewsArticle],
+                                     max_articles: int = 10) -> List[TweetWithHashtags]:
+        """Process articles as a two-stage pipeline; results come back in the same order as process_articles
+        
+        ollama_concurrency workers write tweets and hand them over a bounded queue
+        (pipeline_queue_size) to gemini_concurrency hashtag workers, so both
+        backends work on different articles at once and total time approaches
+        the slower stage. Instead of the fixed one-second delay, both stages
+        share one AsyncRateLimiter that starts a request at most every
+        request_interval seconds (two per article, so the default keeps the old
+        pace of at most one article a second). Ollama requests share one
+        aiohttp session.
+        Per-stage utilization is logged and kept in self.stage_stats.
+        """
+        sorted_articles = self._select_articles(articles, max_articles)
+        tweet_queue = asyncio.Queue()
+        hashtag_queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        results: Dict[int, TweetWithHashtags] = {}
+        busy = {'ollama': 0.0, 'gemini': 0.0}
+        limiter = AsyncRateLimiter(self.request_interval)
+        
+        for i, article in enumerate(sorted_articles, 1):
+            if not self._should_skip(article):
+                tweet_queue.put_nowait((i, article))
+        
+        async def tweet_worker(session: aiohttp.ClientSession):
+            while not tweet_queue.empty():
+                i, article = tweet_queue.get_nowait()
+                logger.info(f"Processing article {i}/{len(sorted_articles)}: {article.title[:50]}...")
+                await limiter.wait()
+                started = time.perf_counter()
+                tweet = await self.generate_tweet_with_ollama_async(session, article)
+                busy['ollama'] += time.perf_counter() - started
+                if not tweet:
+                    logger.warning(f"Failed to generate tweet for: {article.title}")
+                    continue
+                # Blocks while Gemini is behind (backpressure)
+                await hashtag_queue.put((i, article, tweet))
+        
+        async def hashtag_worker():
+            while True:
+                item = await hashtag_queue.get()
+                if item is None:
+                    return
+                i, article, tweet = item
+                await limiter.wait()
+                started = time.perf_counter()
+                hashtags = await self.generate_hashtags_with_gemini_async(tweet, article)
+                busy['gemini'] += time.perf_counter() - started
+                results[i] = TweetWithHashtags(
+                    tweet=tweet,
+                    hashtags=hashtags,
+                    article_url=article.url,
+                    topics=article.topics
+                )
+        
+        started = time.perf_counter()
+        connector = aiohttp.TCPConnector(limit=self.ollama_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            hashtag_workers = [asyncio.create_task(hashtag_worker()) for _ in range(self.gemini_concurrency)]
+            await asyncio.gather(*(tweet_worker(session) for _ in range(self.ollama_concurrency)))
+            for _ in hashtag_workers:
+                await hashtag_queue.put(None)
+            await asyncio.gather(*hashtag_workers)
+        elapsed = time.perf_counter() - started
+        
+        # Utilization: share of each stage's worker time spent waiting on its backend
+        self.stage_stats = {
+            'elapsed_seconds': round(elapsed, 3),
+            'ollama': {'workers': self.ollama_concurrency, 'busy_seconds': round(busy['ollama'], 3),
+                       'utilization': round(busy['ollama'] / (elapsed * self.ollama_concurrency), 3) if elapsed else 0.0},
+            'gemini': {'workers': self.gemini_concurrency, 'busy_seconds': round(busy['gemini'], 3),
+                       'utilization': round(busy['gemini'] / (elapsed * self.gemini_concurrency), 3) if elapsed else 0.0}
+        }
+        logger.info(
+            f"Pipeline took {elapsed:.1f}s: Ollama {self.stage_stats['ollama']['utilization']:.0%} busy "
+            f"({busy['ollama']:.1f}s), Gemini {self.stage_stats['gemini']['utilization']:.0%} busy "
+            f"({busy['gemini']:.1f}s)"
+        )
+        
+        ordered = [results[i] for i in sorted(results)]
+        logger.info(f"Successfully processed {len(ordered)} articles")
+        return ordered
+    
     def save_results(self, results: List[TweetWithHashtags], output_file: str = "generated_tweets.json"):
         """Save results to JSON file"""
         try:
@@ -301,14 +490,20 @@ def main():
     
     # Configuration - UPDATE THESE VALUES
     GEMINI_API_KEY = "Replace with your actual Gemini API key"  # Replace with your actual Gemini API key
-    JSON_FILE_PATH = r"C:\Users\abhay\OneDrive\Desktop\Twitter_bot\bbc_improved_data.json"  # Path to your JSON file
+    JSON_FILE_PATH = r"C:\Users\abhay\OneDrive\Desktop\Twitter_bot\bbc_improved_data.jsonl"  # Path to your crawler output (.jsonl or .json)
     OLLAMA_URL = "http://localhost:11434"  # Ollama server URL
     MAX_ARTICLES = 100  # Number of articles to process
+    OLLAMA_CONCURRENCY = 2  # Parallel Ollama requests (match OLLAMA_NUM_PARALLEL on the server)
+    GEMINI_CONCURRENCY = 4  # Parallel Gemini requests
+    REQUEST_INTERVAL = 0.5  # Seconds between requests (keep within your Gemini API rate limit)
     
     # Initialize processor
     processor = NewsProcessor(
         gemini_api_key=GEMINI_API_KEY,
-        ollama_base_url=OLLAMA_URL
+        ollama_base_url=OLLAMA_URL,
+        ollama_concurrency=OLLAMA_CONCURRENCY,
+        gemini_concurrency=GEMINI_CONCURRENCY,
+        request_interval=REQUEST_INTERVAL
     )
     
     try:
@@ -324,7 +519,7 @@ def main():
         
         # Process articles
         print(f"\nProcessing {min(MAX_ARTICLES, len(articles))} articles...")
-        results = processor.process_articles(articles, max_articles=MAX_ARTICLES)
+        results = asyncio.run(processor.process_articles_async(articles, max_articles=MAX_ARTICLES))
         
         if not results:
             print("No tweets generated. Please check your configuration.")
@@ -333,6 +528,10 @@ def main():
         # Print results
         processor.print_results(results)
         
+        stats = processor.stage_stats
+        print(f"\nPipeline time: {stats['elapsed_seconds']:.1f}s "
+              f"(Ollama {stats['ollama']['utilization']:.0%} busy, Gemini {stats['gemini']['utilization']:.0%} busy)")
+        
         # Save results
         processor.save_results(results)
         
@@ -343,5 +542,5 @@ def main():
         logger.error(f"Error in main execution: {e}")
         print(f"Error: {e}")
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     main()